@@ -0,0 +1,162 @@
+import copy
+import os
+import shutil
+import tempfile
+from typing import List
+import torch
+
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "crypto_sentiment"))
+
+
+class TorchBackend:
+    """Plain fp32 PyTorch inference."""
+    name = "torch"
+
+    def __init__(self, model):
+        self.model = model.eval()
+
+    def __call__(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            outputs = self.model(input_ids=input_ids, attention_mask=attention_mask)
+        return outputs.logits
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """PyTorch inference with int8 dynamically quantized linear layers."""
+    name = "torch-int8"
+
+    def __init__(self, model):
+        quantized_model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=False)
+        super().__init__(quantized_model)
+
+
+class OnnxBackend:
+    """ONNX Runtime inference of the model exported once into the model cache directory."""
+    name = "onnx"
+
+    def __init__(self, model, model_name: str, model_revision: str = "main", cache_dir: str = MODEL_CACHE_DIR, num_threads: int = 0):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The `onnx` backend requires the `onnxruntime` package.") from e
+
+        self.onnx_path = export_onnx(model, model_name, model_revision, cache_dir)
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = num_threads
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(self.onnx_path, session_options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        inputs = {
+            "input_ids": input_ids.numpy(),
+            "attention_mask": attention_mask.numpy()
+        }
+        logits = self.session.run(["logits"], inputs)[0]
+        return torch.from_numpy(logits)
+
+
+def export_onnx(model, model_name: str, model_revision: str = "main", cache_dir: str = MODEL_CACHE_DIR) -> str:
+    """
+    Exports the model to ONNX unless it is already cached and returns the path of the graph.
+
+    Graphs are cached per model revision, so an updated model is exported again. The graph is written
+    into a temporary directory and renamed into place, an interrupted export never leaves a partial graph.
+    """
+    model_dir = os.path.join(cache_dir, model_name.replace("/", "__"), model_revision)
+    onnx_path = os.path.join(model_dir, "model.onnx")
+    if os.path.exists(onnx_path):
+        return onnx_path
+
+    os.makedirs(model_dir, exist_ok=True)
+    dummy_input_ids = torch.ones((2, 16), dtype=torch.long)
+    dummy_attention_mask = torch.ones((2, 16), dtype=torch.long)
+
+    export_dir = tempfile.mkdtemp(prefix=".export-", dir=model_dir)
+    try:
+        export_path = os.path.join(export_dir, "model.onnx")
+        model.eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (dummy_input_ids, dummy_attention_mask),
+                export_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch"}
+                },
+                opset_version=14
+            )
+        # atomic within the same filesystem, concurrent exports of the same revision simply overwrite each other
+        os.replace(export_path, onnx_path)
+    finally:
+        shutil.rmtree(export_dir, ignore_errors=True)
+    return onnx_path
+
+
+def create_backend(backend: str, model, model_name: str, model_revision: str = "main", num_threads: int = 0):
+    """Returns an inference backend of the given name wrapping the loaded fp32 model, `num_threads=0` lets ONNX Runtime use all cores."""
+    if backend == "torch":
+        return TorchBackend(model)
+    if backend == "torch-int8":
+        return QuantizedTorchBackend(model)
+    if backend == "onnx":
+        return OnnxBackend(model, model_name, model_revision, num_threads=num_threads)
+    raise ValueError(f"Unknown inference backend `{backend}`. Available backends: {', '.join(BACKENDS)}.")
+
+
+def check_backend_parity(classifier, texts: List[str], min_agreement: float = 0.99) -> float:
+    """
+    Compares labels of the classifier's backend against the fp32 PyTorch model.
+
+    Args:
+        classifier: Tweet or article sentiment classifier exposing `model` and `engine`.
+        texts (List[str]): Sample texts to classify with both backends.
+        min_agreement (float): Minimal fraction of matching labels.
+
+    Returns:
+        float: Fraction of texts for which both backends agree on the label.
+
+    Raises:
+        ValueError: If the agreement is lower than `min_agreement`.
+    """
+    if not texts:
+        raise ValueError("Argument 'texts' must contain at least one text.")
+
+    reference_engine = copy.copy(classifier.engine)
+    reference_engine.backend = TorchBackend(classifier.model)
+
+    expected = reference_engine.classify(texts)
+    actual = classifier.engine.classify(texts)
+
+    matching = sum(1 for exp, act in zip(expected, actual) if exp['label'] == act['label'])
+    agreement = matching / len(texts)
+
+    if agreement < min_agreement:
+        raise ValueError(f"Backend `{classifier.engine.backend.name}` agrees with fp32 labels on {agreement:.2%} of texts, required {min_agreement:.2%}.")
+
+    return agreement
+
+
+def ensure_backend_parity(classifier, texts: List[str], min_agreement: float = 0.99) -> bool:
+    """
+    Runs `check_backend_parity` and switches the classifier to the fp32 PyTorch backend on a mismatch.
+
+    Returns:
+        bool: True if the classifier keeps its backend, False if it fell back to PyTorch.
+    """
+    try:
+        agreement = check_backend_parity(classifier, texts, min_agreement)
+    except ValueError as e:
+        print(f"{e} Falling back to the `torch` backend.")
+        classifier.engine.backend = TorchBackend(classifier.model)
+        classifier.backend_name = TorchBackend.name
+        return False
+
+    print(f"Backend `{classifier.backend_name}` of `{classifier.model_name}` agrees with fp32 labels on {agreement:.2%} of texts")
+    return True
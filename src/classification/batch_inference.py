@@ -0,0 +1,170 @@
+from typing import Callable, Dict, List, Union
+import torch
+import torch.nn.functional as F
+from classification.backends import TorchBackend
+from utils.instrumentation import Instrumentation
+
+
+def length_buckets(lengths: List[int], max_tokens_per_batch: int) -> List[List[int]]:
+    """Groups indices of inputs sorted by length into buckets whose padded size fits into the token budget."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+
+    batches = []
+    current_batch = []
+    for index in order:
+        # inputs are sorted ascending, so the current one is the longest in the bucket
+        padded_size = (len(current_batch) + 1) * max(lengths[index], 1)
+        if current_batch and padded_size > max_tokens_per_batch:
+            batches.append(current_batch)
+            current_batch = []
+        current_batch.append(index)
+
+    if current_batch:
+        batches.append(current_batch)
+
+    return batches
+
+
+def pad_sequences(sequences: List[List[int]], pad_token_id: int) -> Dict[str, torch.Tensor]:
+    """Right-pads token id sequences to the longest sequence and returns `input_ids` with the matching `attention_mask`."""
+    batch_length = max(len(sequence) for sequence in sequences)
+    input_ids = torch.full((len(sequences), batch_length), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(sequences), batch_length), dtype=torch.long)
+
+    for i, sequence in enumerate(sequences):
+        input_ids[i, :len(sequence)] = torch.tensor(sequence, dtype=torch.long)
+        attention_mask[i, :len(sequence)] = 1
+
+    return {'input_ids': input_ids, 'attention_mask': attention_mask}
+
+
+class BatchInferenceEngine:
+    def __init__(self, model, tokenizer, max_length: int = 128, max_tokens_per_batch: int = 4096, labels: Union[Dict[int, str], None] = None, backend: Union[Callable, None] = None):
+        """
+        Length-bucketed batch inference for sequence classification models.
+
+        Inputs are sorted by token length and grouped into buckets whose padded size
+        (batch size * longest sequence in the bucket) stays under `max_tokens_per_batch`.
+        Every bucket is padded only up to its own longest sequence and run by the inference
+        backend (fp32 PyTorch under `torch.inference_mode()` by default), and results are
+        returned in the original input order.
+
+        Args:
+            model: Sequence classification model returning `logits`.
+            tokenizer: Tokenizer matching the model.
+            max_length (int): Maximum number of tokens per input, longer inputs are truncated.
+            max_tokens_per_batch (int): Token budget of a single forward pass (padding included).
+            labels (Dict[int, str]): Mapping of class index to label. Defaults to the model's `id2label`.
+            backend (Callable): Inference backend mapping `(input_ids, attention_mask)` to logits. Defaults to `TorchBackend`.
+        """
+        if max_tokens_per_batch < max_length:
+            raise ValueError("Argument 'max_tokens_per_batch' must be at least 'max_length'.")
+
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.labels = labels or dict(model.config.id2label)
+        self.pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+        self.backend = backend or TorchBackend(model)
+
+    def tokenize(self, texts: List[str]) -> List[List[int]]:
+        """Tokenizes texts without padding and returns token ids of every text."""
+        with Instrumentation.stage("inference.tokenize", items=len(texts)):
+            encodings = self.tokenizer(texts, max_length=self.max_length, truncation=True, padding=False)
+        return encodings['input_ids']
+
+    def make_batches(self, lengths: List[int]) -> List[List[int]]:
+        """Groups input indices sorted by length into buckets fitting into the token budget."""
+        return length_buckets(lengths, self.max_tokens_per_batch)
+
+    def pad_batch(self, sequences: List[List[int]]) -> Dict[str, torch.Tensor]:
+        """Pads token id sequences to the longest sequence in the batch."""
+        return pad_sequences(sequences, self.pad_token_id)
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        """Runs a single forward pass and returns the logits."""
+        return self.backend(input_ids, attention_mask)
+
+    def infer_batch(self, sequences: List[List[int]]) -> List[dict]:
+        """Classifies a single batch of token id sequences."""
+        inputs = self.pad_batch(sequences)
+        return self._classify_tensors(inputs['input_ids'], inputs['attention_mask'])
+
+    def _probabilities(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        with Instrumentation.stage("inference.batch", items=input_ids.shape[0]):
+            return F.softmax(self.forward(input_ids, attention_mask).float(), dim=-1)
+
+    def _classify_tensors(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> List[dict]:
+        probabilities = self._probabilities(input_ids, attention_mask)
+        confidence_scores, predictions = probabilities.max(dim=-1)
+
+        classifications = []
+        for pred, score in zip(predictions.tolist(), confidence_scores.tolist()):
+            classifications.append({"label": self.labels[pred], "score": score})
+        return classifications
+
+    def classify_token_ids(self, sequences: List[List[int]]) -> List[dict]:
+        """Classifies tokenized inputs in length buckets and returns results in the input order."""
+        classifications = [None] * len(sequences)
+
+        for batch in self.make_batches([len(sequence) for sequence in sequences]):
+            batch_classifications = self.infer_batch([sequences[i] for i in batch])
+            for index, classification in zip(batch, batch_classifications):
+                classifications[index] = classification
+
+        return classifications
+
+    def probabilities_token_ids(self, sequences: List[List[int]]) -> torch.Tensor:
+        """Returns class probabilities `(len(sequences), num_labels)` of tokenized inputs in the input order."""
+        probabilities = torch.zeros((len(sequences), len(self.labels)))
+
+        for batch in self.make_batches([len(sequence) for sequence in sequences]):
+            inputs = self.pad_batch([sequences[i] for i in batch])
+            probabilities[torch.tensor(batch, dtype=torch.long)] = self._probabilities(inputs['input_ids'], inputs['attention_mask'])
+
+        return probabilities
+
+    def classify_long(self, texts: List[str], stride: int = 32) -> List[dict]:
+        """
+        Classifies texts of any length with overlapping windows of `max_length` tokens.
+
+        Consecutive windows of a text share `stride` tokens. Windows of all texts are scored together
+        in length buckets, and the window probabilities of every text are averaged with the window's
+        confidence (its top probability) as the weight, so confident passages outweigh neutral filler.
+        Returns one `{"label", "score", "windows"}` dict per text.
+        """
+        if not texts:
+            return []
+        if stride >= self.max_length // 2:
+            raise ValueError("Argument 'stride' must be less than half of 'max_length'.")
+
+        with Instrumentation.stage("inference.tokenize", items=len(texts)):
+            encodings = self.tokenizer(
+                texts, 
+                max_length=self.max_length, 
+                truncation=True, 
+                stride=stride, 
+                return_overflowing_tokens=True, 
+                padding=False
+            )
+        window_texts = torch.tensor(encodings['overflow_to_sample_mapping'], dtype=torch.long)
+        window_probabilities = self.probabilities_token_ids(encodings['input_ids'])
+
+        weights = window_probabilities.max(dim=-1).values
+        weighted_sums = torch.zeros((len(texts), len(self.labels))).index_add_(0, window_texts, window_probabilities * weights.unsqueeze(-1))
+        weight_totals = torch.zeros(len(texts)).index_add_(0, window_texts, weights)
+        window_counts = torch.bincount(window_texts, minlength=len(texts))
+        probabilities = weighted_sums / weight_totals.clamp(min=1e-12).unsqueeze(-1)
+
+        confidence_scores, predictions = probabilities.max(dim=-1)
+        classifications = []
+        for pred, score, windows in zip(predictions.tolist(), confidence_scores.tolist(), window_counts.tolist()):
+            classifications.append({"label": self.labels[pred], "score": score, "windows": windows})
+        return classifications
+
+    def classify(self, texts: List[str]) -> List[dict]:
+        """Tokenizes and classifies texts, returning one `{"label", "score"}` dict per text."""
+        if not texts:
+            return []
+        return self.classify_token_ids(self.tokenize(texts))
@@ -0,0 +1,118 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+from pymongo import UpdateOne
+from mongodb.mongo_connector import MongoDatabase
+
+
+class ClassificationCache:
+    # document field holding the cached value in MongoDB
+    value_field = "classification"
+
+    def __init__(self, model_name: str, model_revision: str, collection_name: str = 'classification_cache', max_size: int = 10000):
+        """
+        Content-hash cache of sentiment classifications.
+
+        Classifications are keyed by a SHA-256 hash of (model name, model revision, cleaned text).
+        Lookups go to an in-process LRU first and fall back to a MongoDB collection, so identical
+        texts are scored by the model only once across runs.
+
+        Attributes:
+            model_name (str): Name of the model producing the classifications.
+            model_revision (str): Revision (commit hash) of the model, a new revision invalidates old entries.
+            collection_name (str): MongoDB collection backing the cache.
+            max_size (int): Maximum number of entries kept in the in-process LRU.
+        """
+        self.model_name = model_name
+        self.model_revision = model_revision
+        self.collection_name = collection_name
+        self.max_size = max_size
+        self.connector = MongoDatabase()
+
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def make_key(self, text: str) -> str:
+        content = "\0".join([self.model_name, self.model_revision, text])
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, classification: dict):
+        with self._lock:
+            self._lru[key] = classification
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    def _find_in_db(self, keys: List[str]) -> Dict[str, dict]:
+        if self.connector.DATABASE is None or not keys:
+            return {}
+        try:
+            cursor = self.connector.find(self.collection_name, {"_id": {"$in": keys}})
+            return {doc['_id']: doc[self.value_field] for doc in cursor}
+        except Exception as e:
+            print(f"Error with reading classification cache from MongoDB: {e}")
+            return {}
+
+    def get_many(self, texts: List[str]) -> Dict[int, dict]:
+        """Returns cached classifications as a mapping of text index to classification."""
+        keys = [self.make_key(text) for text in texts]
+        found = {}
+        missing_keys = []
+
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+                else:
+                    missing_keys.append(key)
+
+        db_found = self._find_in_db(list(set(missing_keys)))
+        for key, classification in db_found.items():
+            self._remember(key, classification)
+        found.update(db_found)
+
+        cached = {}
+        for index, key in enumerate(keys):
+            if key in found:
+                cached[index] = found[key]
+
+        self.db_hits += sum(1 for key in missing_keys if key in db_found)
+        self.memory_hits += len(keys) - len(missing_keys)
+        self.misses += len(keys) - len(cached)
+        return cached
+
+    def put_many(self, texts: List[str], classifications: List[dict]):
+        """Stores classifications of the given texts in the LRU and in MongoDB."""
+        operations = {}
+        for text, classification in zip(texts, classifications):
+            key = self.make_key(text)
+            self._remember(key, classification)
+            operations[key] = UpdateOne(
+                {"_id": key},
+                {"$setOnInsert": {"model": self.model_name, "revision": self.model_revision, self.value_field: classification}},
+                upsert=True
+            )
+
+        if self.connector.DATABASE is None or not operations:
+            return
+        try:
+            self.connector.get_database()[self.collection_name].bulk_write(list(operations.values()), ordered=False)
+        except Exception as e:
+            print(f"Error with writing classification cache into MongoDB: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        """Returns hit/miss counters of the cache."""
+        hits = self.memory_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
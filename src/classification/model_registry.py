@@ -0,0 +1,97 @@
+import gc
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class ModelRegistry(object):
+    """
+    Process-wide registry of loaded classification models.
+
+    Every model is loaded lazily on the first `get` call and the same instance is handed out
+    to all later callers, so `from_pretrained` is paid once per process instead of once per run.
+    """
+    FACTORIES: Dict[str, Callable[[], Any]] = {}
+    MODELS: Dict[str, Any] = {}
+    LOAD_TIMES: Dict[str, float] = {}
+
+    _LOCK = threading.RLock()
+
+
+    @staticmethod
+    def register(name: str, factory: Callable[[], Any]):
+        """Registers a factory building the model instance stored under `name`."""
+        with ModelRegistry._LOCK:
+            ModelRegistry.FACTORIES[name] = factory
+
+    @staticmethod
+    def get(name: str) -> Any:
+        """Returns the shared instance of the model `name`, loading it on first use."""
+        model = ModelRegistry.MODELS.get(name)
+        if model is not None:
+            return model
+
+        with ModelRegistry._LOCK:
+            # another thread may have finished loading while we were waiting for the lock
+            if name in ModelRegistry.MODELS:
+                return ModelRegistry.MODELS[name]
+
+            if name not in ModelRegistry.FACTORIES:
+                raise KeyError(f"No model registered under the name `{name}`.")
+
+            start = time.perf_counter()
+            model = ModelRegistry.FACTORIES[name]()
+            load_time = time.perf_counter() - start
+
+            ModelRegistry.MODELS[name] = model
+            ModelRegistry.LOAD_TIMES[name] = load_time
+            print(f"Loaded model `{name}` in {load_time:.2f}s")
+            return model
+
+    @staticmethod
+    def warm_up(names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """
+        Loads the given models (all registered models by default) ahead of the first request.
+
+        Returns:
+            Dict[str, float]: Load time in seconds of every warmed-up model.
+        """
+        if names is None:
+            names = list(ModelRegistry.FACTORIES)
+
+        for name in names:
+            ModelRegistry.get(name)
+
+        return {name: ModelRegistry.LOAD_TIMES[name] for name in names}
+
+    @staticmethod
+    def is_loaded(name: str) -> bool:
+        return name in ModelRegistry.MODELS
+
+    @staticmethod
+    def evict(name: str) -> bool:
+        """Drops the model `name` from the registry so its memory can be reclaimed. Returns True if it was loaded."""
+        with ModelRegistry._LOCK:
+            model = ModelRegistry.MODELS.pop(name, None)
+            ModelRegistry.LOAD_TIMES.pop(name, None)
+
+        if model is None:
+            return False
+
+        # models may hold resources outside the registry, e.g. inference worker processes
+        close = getattr(model, "close", None)
+        if close is not None:
+            close()
+        del model
+        gc.collect()
+        return True
+
+    @staticmethod
+    def evict_all():
+        for name in list(ModelRegistry.MODELS):
+            ModelRegistry.evict(name)
+
+    @staticmethod
+    def load_times() -> Dict[str, float]:
+        """Returns cold-start load time in seconds of every currently loaded model."""
+        return dict(ModelRegistry.LOAD_TIMES)
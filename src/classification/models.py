@@ -1,30 +1,37 @@
 from abc import ABC, abstractmethod
-from transformers import TextClassificationPipeline, AutoModelForSequenceClassification, AutoModelForSeq2SeqLM, AutoTokenizer, pipeline, BertTokenizer, RobertaTokenizer, BatchEncoding
 from typing import Union, List
-from multiprocessing import Pool
-import torch
-import torch.nn.functional as F
+from functools import partial
+import sys
+
+# torch, transformers and the inference modules built on them are imported when a model is
+# first constructed, so importing this module (e.g. for the ModelRegistry factories) is cheap
 
 
 class ArticleSummarizer:
-    def __init__(self):
+    def __init__(self, max_tokens_per_batch: int = 8192, use_cache: bool = True):
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+        from classification.summarization import SummarizationEngine, SummaryCache
+
         self.model_name = "facebook/bart-large-cnn"
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, use_fast=True)
         self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name)
-        self.pipeline = pipeline("summarization", model=self.model, tokenizer=self.tokenizer, truncation=True)
+        self.model.eval()
+        self.model_revision = getattr(self.model.config, "_commit_hash", None) or "main"
+        self.engine = SummarizationEngine(
+            self.model, 
+            self.tokenizer, 
+            max_tokens_per_batch=max_tokens_per_batch, 
+            cache=SummaryCache(self.model_name, self.model_revision) if use_cache else None
+        )
 
     def summarize(self, input: Union[str, List[str]], max_length=150, min_length=40) -> Union[str, List[str]]:
         if isinstance(input, str):
-            model_response = self.pipeline(input, max_length=max_length, min_length=min_length, do_sample=False)
-            summarized_article = model_response['summary_text']
-            return summarized_article
+            return self.engine.summarize([input], max_length=max_length, min_length=min_length)[0]
         
         elif isinstance(input, list):
-            model_response = self.pipeline(input, max_length=max_length, min_length=min_length, do_sample=False)
-            summarized_articles = []
-            for article_data in model_response:
-                summarized_articles.append(article_data['summary_text'])
-            return summarized_articles
+            return self.engine.summarize(input, max_length=max_length, min_length=min_length)
+
+        raise TypeError("Argument `input` must be a string or a list of strings.")
 
 
 class SentimentClassifier(ABC):
@@ -39,84 +46,79 @@ class SentimentClassifier(ABC):
 
 
 class TweetSentimentClassifier(SentimentClassifier):
-    def __init__(self):
+    labels = {
+        0:"Bearish", 
+        1:"Neutral", 
+        2:"Bullish"
+    }
+
+    def __init__(self, max_tokens_per_batch: int = 4096, backend: str = "torch", num_threads: int = 0):
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        from classification.batch_inference import BatchInferenceEngine
+        from classification.backends import create_backend
+
         self.model_name = "ElKulako/cryptobert" # https://huggingface.co/ElKulako/cryptobert
+        self.backend_name = backend
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, use_fast=True)
         self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name, num_labels=3)
-        self.pipe = TextClassificationPipeline(model=self.model, tokenizer=self.tokenizer, max_length=128, truncation=True, padding='max_length')
+        self.model_revision = getattr(self.model.config, "_commit_hash", None) or "main"
+        self.engine = BatchInferenceEngine(
+            self.model, 
+            self.tokenizer, 
+            max_length=128, 
+            max_tokens_per_batch=max_tokens_per_batch, 
+            labels=self.labels, 
+            backend=create_backend(backend, self.model, self.model_name, self.model_revision, num_threads)
+        )
+
+    @property
+    def cache_name(self) -> str:
+        # follows the backend, which changes when a backend failing the parity check falls back to torch
+        return f"{self.model_name}:{self.backend_name}"
 
     def evaluate(self, eval_dataset):
         pass 
 
-    def _classify_chunk(self, chunk):
-        
-        if isinstance(chunk[0], BatchEncoding):
-
-            if not all('input_ids' in item and 'attention_mask' in item for item in chunk):
-                raise ValueError("Each dictionary in chunk must have 'input_ids' and 'attention_mask' keys.")
-            
-            input_ids_list = [item['input_ids'].squeeze(0) for item in chunk]
-            attention_mask_list = [item['attention_mask'].squeeze(0) for item in chunk]
-
-            input_ids_tensor = torch.stack(input_ids_list)
-            attention_mask_tensor = torch.stack(attention_mask_list)
-            
-            inputs = {
-                'input_ids': input_ids_tensor,
-                'attention_mask': attention_mask_tensor
-            }
-            
-            outputs = self.model(**inputs)
-            
-            logits = outputs.logits
-            probabilities = F.softmax(logits, dim=-1)
-            predictions = logits.argmax(dim=-1)
-            confidence_scores = probabilities.max(dim=-1).values
-
-            classifications = []
-
-            labels = {
-                0:"Bearish", 
-                1:"Neutral", 
-                2:"Bullish"
-            }
-
-            for i, pred in enumerate(predictions.tolist()):
-                
-                classification = {
-                    "label": labels[pred], 
-                    "score": confidence_scores[i].item()
-                }
-
-                classifications.append(classification)
-        
-            return classifications
+    def _to_token_ids(self, chunk) -> List[List[int]]:
+        """Converts a chunk of tweets or prepared model inputs into unpadded token id sequences."""
+        if isinstance(chunk[0], list):
+            # token ids from `TweetProcessor.prepare_inputs_for_model`
+            return chunk
 
         elif isinstance(chunk[0], str):
-            classifications = self.pipe(chunk) 
-            return classifications 
+            return self.engine.tokenize(chunk)
 
         else:
-            raise TypeError("Can't classify chunk of data. It needs to be a list of dictionaries with prepared model inputs or list of tweets in string format.")
+            raise TypeError("Can't classify chunk of data. It needs to be a list of token id lists prepared for the model or list of tweets in string format.")
+
+    def _classify_chunk(self, chunk):
+        return self.engine.classify_token_ids(self._to_token_ids(chunk))
         
 
-    def classify_sentiment(self, tweets: Union[List[str], List[dict]], num_processes: int = 1):
+    def classify_sentiment(self, tweets: Union[List[str], List[List[int]]], num_processes: int = 1):
         if num_processes < 1:
             raise ValueError("Value for argument 'num_processes' must be at least 1.")
         
-        if not isinstance(tweets, (list, dict)):
-            raise TypeError("Argument 'tweets' must be a list of strings or list of dictionaries.")
-        
-        tweets_per_process = len(tweets) // num_processes
+        if not isinstance(tweets, list):
+            raise TypeError("Argument 'tweets' must be a list of strings or list of token id lists.")
+
+        if not tweets:
+            return []
 
-        tweet_chunks = [tweets[i:i + tweets_per_process] for i in range(0, len(tweets), tweets_per_process)]
+        if num_processes == 1:
+            return self._classify_chunk(tweets)
 
-        with Pool(num_processes) as pool:
-            classifications = pool.map(self._classify_chunk, tweet_chunks)
+        from classification.worker_pool import InferenceWorkerPool
 
-        classifications = [item for sublist in classifications for item in sublist]
+        # the pool outlives this call, workers keep the model loaded between runs
+        classifier_factory = partial(type(self), backend=self.backend_name)
+        worker_pool = InferenceWorkerPool.get(self.cache_name, self.engine, num_processes, classifier_factory)
+        return worker_pool.classify_token_ids(self._to_token_ids(tweets))
 
-        return classifications        
+    def close(self):
+        """Stops the inference worker processes of this model, called when the model is evicted."""
+        if "classification.worker_pool" in sys.modules:
+            sys.modules["classification.worker_pool"].InferenceWorkerPool.shutdown(self.cache_name)
     
 
     def calc_overall_sentiment(self, classifications: List[dict]) -> float:
@@ -145,13 +147,32 @@ class TweetSentimentClassifier(SentimentClassifier):
     
 
 class ArticleSentimentClassifier:
-    def __init__(self):
+    def __init__(self, max_tokens_per_batch: int = 4096, backend: str = "torch", long_document: bool = True, window_stride: int = 32, num_threads: int = 0):
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        from classification.batch_inference import BatchInferenceEngine
+        from classification.backends import create_backend
+
         self.model_name = "ProsusAI/finbert" # https://huggingface.co/ProsusAI/finbert
+        self.backend_name = backend
+        # whole articles are scored with overlapping windows, otherwise only the first 128 tokens are
+        self.long_document = long_document
+        self.window_stride = window_stride
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, use_fast=True)
         self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name, num_labels=3)
-        self.pipe = TextClassificationPipeline(model=self.model, tokenizer=self.tokenizer, max_length=128, truncation=True)
+        self.model_revision = getattr(self.model.config, "_commit_hash", None) or "main"
+        self.engine = BatchInferenceEngine(
+            self.model, 
+            self.tokenizer, 
+            max_length=128, 
+            max_tokens_per_batch=max_tokens_per_batch, 
+            backend=create_backend(backend, self.model, self.model_name, self.model_revision, num_threads)
+        )
+
+    @property
+    def cache_name(self) -> str:
+        return f"{self.model_name}:{self.backend_name}" + (f":windows-{self.window_stride}" if self.long_document else "")
 
     def classify_sentiment(self, articles: List[str]):
-        input_data = [{"text": article} for article in articles]
-        classifications = self.pipe(input_data)
-        return classifications
\ No newline at end of file
+        if self.long_document:
+            return self.engine.classify_long(articles, stride=self.window_stride)
+        return self.engine.classify(articles)
\ No newline at end of file
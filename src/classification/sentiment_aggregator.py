@@ -0,0 +1,198 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Union
+from mongodb.mongo_connector import MongoDatabase
+from mongodb.mongo_models import DailySentimentObj
+from classification.sentiment_rollups import ROLLUPS_COLLECTION, rollup_keys, to_utc, truncate
+
+
+# labels of both classifiers (cryptobert and FinBERT) mapped onto the daily counters
+LABEL_POLARITY = {
+    "Bullish": "positive",
+    "positive": "positive",
+    "Neutral": "neutral",
+    "neutral": "neutral",
+    "Bearish": "negative",
+    "negative": "negative",
+}
+
+
+def start_of_day(moment: Union[datetime, None] = None) -> datetime:
+    """ Returns midnight of the given moment's UTC day (today by default), used as the `day` key of daily counters. """
+    return truncate(moment or datetime.utcnow(), "day")
+
+
+def sentiment_item(tweet: dict) -> dict:
+    """ Returns the aggregator item of a classified tweet. """
+    return {
+        "id": tweet['tweet_id'],
+        "label": tweet['sentiment'],
+        "created": tweet.get('created'),
+        "account": tweet.get('tweet_creator_username'),
+        "tickers": tweet.get('cashtags', [])
+    }
+
+
+def contribution_key(contribution: dict) -> tuple:
+    """ Returns a hashable key of a counter contribution `{"collection", "query", "counter"}`. """
+    return contribution['collection'], tuple(sorted(contribution['query'].items())), contribution['counter']
+
+
+def contribution_deltas(current: List[dict], desired: List[dict]) -> Dict[tuple, int]:
+    """ Returns the non-zero counter changes (by `contribution_key`) turning the `current` contributions of a document into the `desired` ones. """
+    deltas = Counter(contribution_key(contribution) for contribution in desired)
+    deltas.subtract(contribution_key(contribution) for contribution in current)
+    return {key: delta for key, delta in deltas.items() if delta != 0}
+
+
+class SentimentAggregator:
+    def __init__(self, source: str = "tweets", ledger_collection: str = "sentiment_ledger", daily_collection: str = "daily_sentiment"):
+        """
+        Incremental per-day sentiment counters.
+
+        Every classified document is counted under the (UTC) day it was created, the same day bucket the
+        rollups use. The `$inc` counters of the `daily_sentiment` collection and of the hourly/per-account/per-coin
+        buckets in `sentiment_rollups` are updated only for documents that are new or whose label changed.
+        Re-running the pipeline over the same documents is therefore idempotent and costs O(new documents).
+        The ledger records every counter a document currently contributes to, and is updated after the
+        counter writes with the contributions whose writes succeeded. A partially failed update is
+        therefore completed by the next run without counting any counter twice. The sentiment score is
+        derived from the counters on read.
+
+        Attributes:
+            source (str): Kind of counted documents, used in counter names (e.g. `positive_tweets`).
+            ledger_collection (str): Collection recording the counted label and counter contributions of every document.
+            daily_collection (str): Collection with the per-day counters.
+        """
+        self.source = source
+        self.ledger_collection = ledger_collection
+        self.daily_collection = daily_collection
+        self.connector = MongoDatabase()
+
+    def _counter(self, label: str) -> str:
+        return f"{LABEL_POLARITY[label]}_{self.source}"
+
+    def _contributions(self, entry: dict) -> List[dict]:
+        """ Returns every counter the document described by the ledger `entry` adds one to. """
+        polarity = LABEL_POLARITY[entry['label']]
+        contributions = [{"collection": self.daily_collection, "query": {"day": entry['day']}, "counter": self._counter(entry['label'])}]
+        for key in rollup_keys(self.source, entry.get('created'), entry.get('account'), entry.get('tickers')):
+            contributions.append({"collection": ROLLUPS_COLLECTION, "query": key, "counter": polarity})
+        return contributions
+
+    def _counted_contributions(self, previous: Union[dict, None]) -> List[dict]:
+        if previous is None:
+            return []
+        if 'contributions' in previous:
+            return previous['contributions']
+        # ledger entries written before contributions were recorded were counted completely
+        return self._contributions(previous)
+
+    def apply(self, items: List[dict], day: Union[datetime, None] = None) -> Dict[datetime, Dict[str, int]]:
+        """
+        Counts classified documents into the daily counters and the hourly/per-account/per-coin rollups.
+
+        Args:
+            items (List[dict]): Classified documents as `{"id", "label", "created", "account", "tickers"}` dicts,
+                all keys but `id` and `label` are optional and only used for the rollups (see `sentiment_item`).
+            day (datetime): Day documents without `created` are counted under in `daily_sentiment`. Defaults to today.
+
+        Returns:
+            Dict[datetime, Dict[str, int]]: Daily counter increments applied per day.
+
+        Raises:
+            RuntimeError: If some counters or the ledger could not be updated. Contributions whose counter
+                writes succeeded are recorded in the ledger before raising, so a retry applies only the rest.
+        """
+        default_day = start_of_day(day)
+        entries = {
+            f"{self.source}:{item['id']}": {
+                "label": item['label'],
+                "day": start_of_day(item['created']) if item.get('created') else default_day,
+                "created": to_utc(item['created']) if item.get('created') else None,
+                "account": item.get('account'),
+                "tickers": item.get('tickers', [])
+            }
+            for item in items
+        }
+        if not entries:
+            return {}
+
+        counted = {
+            entry['_id']: entry
+            for entry in self.connector.find(self.ledger_collection, {"_id": {"$in": list(entries)}})
+        }
+
+        # counter changes of all documents are merged into one `$inc` per counter document
+        operations = {}
+        contributions_by_key = {}
+        pending = {}
+        for key, entry in entries.items():
+            current = self._counted_contributions(counted.get(key))
+            desired = self._contributions(entry)
+            deltas = contribution_deltas(current, desired)
+            if not deltas:
+                continue
+
+            for contribution in current + desired:
+                contributions_by_key.setdefault(contribution_key(contribution), contribution)
+            for delta_key, delta in deltas.items():
+                collection, query_key, counter = delta_key
+                operation = operations.setdefault((collection, query_key), {"query": contributions_by_key[delta_key]['query'], "increments": defaultdict(int)})
+                operation['increments'][counter] += delta
+            pending[key] = (entry, current, deltas)
+
+        failed_operations = set()
+        for collection in (self.daily_collection, ROLLUPS_COLLECTION):
+            operation_keys = [
+                operation_key for operation_key, operation in operations.items()
+                if operation_key[0] == collection and any(operation['increments'].values())
+            ]
+            requests = [
+                (operations[operation_key]['query'], {name: value for name, value in operations[operation_key]['increments'].items() if value != 0})
+                for operation_key in operation_keys
+            ]
+            if not requests:
+                continue
+            result = self.connector.bulk_increment(collection, requests)
+            failed_operations.update(operation_keys[index] for index in result.failed_operations)
+
+        ledger_updates = []
+        for key, (entry, current, deltas) in pending.items():
+            counts = Counter(contribution_key(contribution) for contribution in current)
+            for delta_key, delta in deltas.items():
+                if delta_key[:2] not in failed_operations:
+                    counts[delta_key] += delta
+            applied = [contributions_by_key[contribution] for contribution, count in counts.items() for _ in range(count)]
+            ledger_updates.append(({"_id": key}, {**entry, "contributions": applied}))
+
+        result = self.connector.bulk_upsert(self.ledger_collection, ledger_updates)
+        if not result.ok:
+            raise RuntimeError(f"Updating `{self.ledger_collection}` failed: {[error.message for error in result.errors]}")
+        if failed_operations:
+            raise RuntimeError(f"Updating {len(failed_operations)} sentiment counters failed, they are applied by the next run.")
+
+        applied_increments = defaultdict(lambda: defaultdict(int))
+        for (collection, query_key), operation in operations.items():
+            if collection == self.daily_collection:
+                for counter, value in operation['increments'].items():
+                    if value != 0:
+                        applied_increments[operation['query']['day']][counter] += value
+        return {counter_day: dict(counters) for counter_day, counters in applied_increments.items()}
+
+    def get_daily_sentiment(self, day: Union[datetime, None] = None) -> DailySentimentObj:
+        """ Returns counters of the day with the sentiment score derived from them. """
+        day = start_of_day(day)
+        document = self.connector.find_one(self.daily_collection, {"day": day}) or {}
+
+        positive = document.get(f"positive_{self.source}", 0)
+        neutral = document.get(f"neutral_{self.source}", 0)
+        negative = document.get(f"negative_{self.source}", 0)
+
+        return DailySentimentObj(
+            day=day,
+            positive_tweets=positive,
+            neutral_tweets=neutral,
+            negative_tweets=negative,
+            sentiment_score=positive / (positive + negative) if positive + negative else 0.0
+        )
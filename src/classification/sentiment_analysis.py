@@ -1,20 +1,127 @@
 from typing import List, Union, Dict
-from classification.models import TweetSentimentClassifier, ArticleSentimentClassifier
+from functools import partial
+import os
+from classification.models import TweetSentimentClassifier, ArticleSentimentClassifier, ArticleSummarizer
+from classification.model_registry import ModelRegistry
+from classification.classification_cache import ClassificationCache
+
+# one of `torch`, `torch-int8`, `onnx` - see classification/backends.py
+CLASSIFICATION_BACKEND = os.environ.get("CLASSIFICATION_BACKEND", "torch")
+# number of inference worker processes classifying tweets, 1 classifies in the calling process
+CLASSIFICATION_PROCESSES = int(os.environ.get("CLASSIFICATION_PROCESSES", 1))
+
+# texts every non-fp32 backend is compared on against the fp32 model when the classifier is loaded
+PARITY_CHECK_TEXTS = [
+    "Bitcoin just broke its all time high, this bull run is only getting started",
+    "ETH is dumping hard, sold everything before it goes lower",
+    "The SEC postponed its decision on the spot ETF applications again",
+    "Massive liquidations across exchanges as the market crashes overnight",
+    "Accumulating more $SOL every week, long term holders will be rewarded",
+    "Trading volume was flat today and prices barely moved",
+    "This project is a scam, the team drained the liquidity pool",
+    "Institutional inflows keep growing and funding rates look healthy",
+]
+
+
+def _load_classifier(classifier_class):
+    """ Builds a classifier with `CLASSIFICATION_BACKEND`, falling back to fp32 torch if its labels do not match the fp32 model. """
+    classifier = classifier_class(backend=CLASSIFICATION_BACKEND)
+    if classifier.backend_name != "torch":
+        from classification.backends import ensure_backend_parity
+        ensure_backend_parity(classifier, PARITY_CHECK_TEXTS)
+    return classifier
+
+
+ModelRegistry.register("tweet", partial(_load_classifier, TweetSentimentClassifier))
+ModelRegistry.register("article", partial(_load_classifier, ArticleSentimentClassifier))
+ModelRegistry.register("summarizer", ArticleSummarizer)
+
+CLASSIFICATION_CACHES: Dict[str, ClassificationCache] = {}
+
+
+def get_classification_cache(type: str) -> ClassificationCache:
+    """ Returns the classification cache of the classifier registered under `type`. """
+    if type not in CLASSIFICATION_CACHES:
+        classifier = ModelRegistry.get(type)
+        CLASSIFICATION_CACHES[type] = ClassificationCache(
+            model_name=classifier.cache_name, 
+            model_revision=classifier.model_revision
+        )
+    return CLASSIFICATION_CACHES[type]
+
+
+def get_classification_cache_stats() -> Dict[str, Dict[str, float]]:
+    """ Returns hit/miss counters of every classification cache used in this process. """
+    return {type: cache.stats() for type, cache in CLASSIFICATION_CACHES.items()}
+
+
+def warm_up_classifiers(types: Union[List[str], None] = None) -> Dict[str, float]:
+    """ Loads the sentiment classifiers up front, checking their backends against fp32, and returns their load times in seconds. """
+    return ModelRegistry.warm_up(types or ["tweet", "article"])
 
 
 def run_classification(data: List[str], type: str) -> Union[List[Dict], None]:
-    if type != "tweet" and type != "arcticle":
+    if type != "tweet" and type != "article":
         raise ValueError("Argument `type` must be `tweet` or `article`.")
     
-    if type == "tweet":
-        classifier = TweetSentimentClassifier()
-    if type == "article":
-        classifier = ArticleSentimentClassifier()
+    classifier = ModelRegistry.get(type)
+    cache = get_classification_cache(type)
+
+    classifications = [None] * len(data)
+    for index, classification in cache.get_many(data).items():
+        classifications[index] = classification
+
+    # identical texts within one call are classified only once
+    missed_indices = {}
+    for index, text in enumerate(data):
+        if classifications[index] is None:
+            missed_indices.setdefault(text, []).append(index)
+
+    if missed_indices:
+        missed_texts = list(missed_indices)
+        if type == "tweet":
+            new_classifications = classifier.classify_sentiment(missed_texts, num_processes=CLASSIFICATION_PROCESSES)
+        else:
+            new_classifications = classifier.classify_sentiment(missed_texts)
+        cache.put_many(missed_texts, new_classifications)
+
+        for text, classification in zip(missed_texts, new_classifications):
+            for index in missed_indices[text]:
+                classifications[index] = classification
 
-    classifications = classifier.classify_sentiment(data)
     return classifications
 
 
+def classify_tweets(tweets: List[Dict]) -> List[Dict]:
+    """
+    Classify processed tweets and store the label under the `sentiment` key of every tweet.
+
+    Near-duplicate tweets (marked with `duplicate_of`) are classified once, through the representative
+    of their cluster, and get the representative's label.
+
+    Returns:
+        List[Dict]: Classifications of the representative tweets only, so clusters are counted once.
+    """
+    representative_tweets = [tweet for tweet in tweets if 'duplicate_of' not in tweet]
+    tweet_contents = [tweet['content'] for tweet in representative_tweets]
+    classifications = run_classification(tweet_contents, type="tweet")
+
+    sentiment_by_tweet_id = {
+        tweet['tweet_id']: sentiment for tweet, sentiment in zip(representative_tweets, classifications)
+    }
+
+    for tweet in tweets:
+        sentiment = sentiment_by_tweet_id[tweet.get('duplicate_of', tweet['tweet_id'])]
+        tweet['sentiment'] = sentiment['label']
+
+    return classifications
+
+
+def summarize_articles(articles: List[str], max_length: int = 150, min_length: int = 40) -> List[str]:
+    """ Summarize articles of any length, cached summaries are reused. """
+    return ModelRegistry.get("summarizer").summarize(articles, max_length=max_length, min_length=min_length)
+
+
 def calc_final_sentiment(tweets_sentiment: Union[List[Dict], None] = None, articles_sentiment: Union[List[Dict], None] = None) -> float:
     """
     Calculate the final sentiment based on the sentiment of tweets and articles.
@@ -46,7 +153,6 @@ def calc_final_sentiment(tweets_sentiment: Union[List[Dict], None] = None, artic
 
     for classification in classifications:
         label = classification['label']
-        print("LABEL-----", label)
         if label == 'Bullish':
             positive_counter += 1 
         if label == 'Bearish':
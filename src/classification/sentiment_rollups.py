@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Union
+from mongodb.mongo_connector import MongoDatabase
+
+
+ROLLUPS_COLLECTION = "sentiment_rollups"
+GRANULARITIES = ("hour", "day")
+POSITIVE_LABELS = ["Bullish", "positive"]
+NEUTRAL_LABELS = ["Neutral", "neutral"]
+NEGATIVE_LABELS = ["Bearish", "negative"]
+
+
+def to_utc(moment: datetime) -> datetime:
+    """ Returns `moment` as a naive UTC datetime, the form MongoDB returns stored dates in. Naive input is taken as UTC. """
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def truncate(moment: datetime, granularity: str) -> datetime:
+    """ Returns the start of the (UTC) hour or day bucket containing `moment`. """
+    moment = to_utc(moment)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Argument `granularity` must be one of: {', '.join(GRANULARITIES)}.")
+
+
+def rollup_keys(source: str, created: Union[datetime, None], account: Union[str, None], tickers: Union[List[str], None] = None) -> List[dict]:
+    """
+    Returns keys of all rollup buckets a classified document counts into.
+
+    Every document counts into the overall (`all`) bucket and, when known, into the bucket of its
+    author and the buckets of every coin (cashtag) it mentions, both at hourly and daily granularity.
+    """
+    if created is None:
+        return []
+
+    dimensions = [("all", "*")]
+    if account:
+        dimensions.append(("account", account))
+    for ticker in tickers or []:
+        dimensions.append(("coin", ticker))
+
+    keys = []
+    for granularity in GRANULARITIES:
+        bucket = truncate(created, granularity)
+        for dimension, key in dimensions:
+            keys.append({"source": source, "granularity": granularity, "dimension": dimension, "key": key, "bucket": bucket})
+    return keys
+
+
+def get_sentiment_series(start: datetime, end: datetime, granularity: str = "hour", account: Union[str, None] = None, coin: Union[str, None] = None, source: str = "tweets") -> List[Dict]:
+    """
+    Returns the sentiment time series of the given range from the pre-materialized rollups.
+
+    Args:
+        start (datetime): Start of the range (inclusive).
+        end (datetime): End of the range (exclusive).
+        granularity (str): `hour` or `day`.
+        account (str): Username of a followed account, defaults to all accounts.
+        coin (str): Ticker of a coin (e.g. `ETH`), defaults to all coins. Cannot be combined with `account`.
+        source (str): Kind of counted documents.
+
+    Returns:
+        List[Dict]: Buckets ordered by time with `bucket`, `positive`, `neutral`, `negative` and `sentiment_score`.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Argument `granularity` must be one of: {', '.join(GRANULARITIES)}.")
+
+    if account and coin:
+        raise ValueError("Arguments `account` and `coin` cannot be combined.")
+
+    if account:
+        dimension, key = "account", account
+    elif coin:
+        dimension, key = "coin", coin.upper()
+    else:
+        dimension, key = "all", "*"
+
+    query = {
+        "source": source,
+        "granularity": granularity,
+        "dimension": dimension,
+        "key": key,
+        "bucket": {"$gte": start, "$lt": end}
+    }
+
+    series = []
+    for document in MongoDatabase.find(ROLLUPS_COLLECTION, query).sort("bucket", 1):
+        positive = document.get("positive", 0)
+        neutral = document.get("neutral", 0)
+        negative = document.get("negative", 0)
+        series.append({
+            "bucket": document["bucket"],
+            "positive": positive,
+            "neutral": neutral,
+            "negative": negative,
+            "sentiment_score": positive / (positive + negative) if positive + negative else None
+        })
+    return series
+
+
+def rebuild_rollups(start: datetime, end: datetime, source_collection: str = "tweets", source: str = "tweets"):
+    """
+    Recomputes the rollups of the given range from classified documents with MongoDB aggregation pipelines.
+
+    Meant for backfills, e.g. after the rollups were introduced, regular runs keep them up to date incrementally.
+    Buckets of the range are replaced by the recomputed counts.
+    """
+    count_labels = {
+        name: {"$sum": {"$cond": [{"$in": ["$sentiment", labels]}, 1, 0]}}
+        for name, labels in (("positive", POSITIVE_LABELS), ("neutral", NEUTRAL_LABELS), ("negative", NEGATIVE_LABELS))
+    }
+    dimensions = {"all": {"$literal": "*"}, "account": "$tweet_creator_username", "coin": "$cashtags"}
+
+    database = MongoDatabase.get_database()
+    for granularity in GRANULARITIES:
+        for dimension, key in dimensions.items():
+            pipeline = [
+                {"$match": {
+                    "created": {"$gte": start, "$lt": end},
+                    "sentiment": {"$exists": True},
+                    "duplicate_of": {"$exists": False}
+                }},
+                # a tweet mentioning several coins counts into the bucket of every coin
+                *([{"$unwind": "$cashtags"}] if dimension == "coin" else []),
+                {"$group": {
+                    "_id": {"bucket": {"$dateTrunc": {"date": "$created", "unit": granularity}}, "key": key},
+                    **count_labels
+                }},
+                {"$project": {
+                    "_id": 0,
+                    "source": {"$literal": source},
+                    "granularity": {"$literal": granularity},
+                    "dimension": {"$literal": dimension},
+                    "key": "$_id.key",
+                    "bucket": "$_id.bucket",
+                    "positive": 1,
+                    "neutral": 1,
+                    "negative": 1
+                }},
+                {"$merge": {
+                    "into": ROLLUPS_COLLECTION,
+                    "on": ["source", "granularity", "dimension", "key", "bucket"],
+                    "whenMatched": "replace",
+                    "whenNotMatched": "insert"
+                }}
+            ]
+            database[source_collection].aggregate(pipeline)
+
+
+def get_ticker_sentiment(ticker: str, day: Union[datetime, None] = None, source: str = "tweets") -> Dict:
+    """ Returns counters and sentiment score of a coin (e.g. `ETH`) on the given day, today by default. """
+    day = truncate(day or datetime.utcnow(), "day")
+    series = get_sentiment_series(day, day + timedelta(days=1), granularity="day", coin=ticker, source=source)
+    if series:
+        return series[0]
+    return {"bucket": day, "positive": 0, "neutral": 0, "negative": 0, "sentiment_score": None}
@@ -1 +1,118 @@
-## article summarizer comming in here 
\ No newline at end of file
+from typing import List, Union
+import torch
+from classification.batch_inference import length_buckets, pad_sequences
+from classification.classification_cache import ClassificationCache
+from utils.instrumentation import Instrumentation
+
+
+class SummaryCache(ClassificationCache):
+    """Content-hash cache of article summaries, stored in the `summary_cache` collection."""
+    value_field = "summary"
+
+    def __init__(self, model_name: str, model_revision: str, collection_name: str = 'summary_cache', max_size: int = 1000):
+        super().__init__(model_name, model_revision, collection_name=collection_name, max_size=max_size)
+
+
+class SummarizationEngine:
+    def __init__(self, model, tokenizer, chunk_tokens: Union[int, None] = None, max_tokens_per_batch: int = 8192, cache: Union[SummaryCache, None] = None):
+        """
+        Batched map-reduce summarization of long documents for sequence-to-sequence models.
+
+        Every document is split into chunks of at most `chunk_tokens` tokens instead of being truncated.
+        Chunks of all documents are summarized together in length buckets (map), the chunk summaries
+        of every document are joined and summarized again (reduce) until a single summary is left.
+        Summaries are cached by content hash, so an article is summarized only once across runs.
+
+        Args:
+            model: Sequence-to-sequence model with `generate`.
+            tokenizer: Tokenizer matching the model.
+            chunk_tokens (int): Maximum number of tokens of a chunk, special tokens included. Defaults to the model's input limit.
+            max_tokens_per_batch (int): Token budget of the inputs of a single `generate` call (padding included).
+            cache (SummaryCache): Cache of summaries, summaries are not cached when None.
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.chunk_tokens = chunk_tokens or min(tokenizer.model_max_length, model.config.max_position_embeddings)
+        if max_tokens_per_batch < self.chunk_tokens:
+            raise ValueError("Argument 'max_tokens_per_batch' must be at least 'chunk_tokens'.")
+
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.cache = cache
+        self.pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+        self.special_tokens = tokenizer.num_special_tokens_to_add(pair=False)
+
+    def chunk(self, text: str) -> List[List[int]]:
+        """Splits a text into token id chunks fitting into the model's input, special tokens included."""
+        token_ids = self.tokenizer(text, add_special_tokens=False, truncation=False)['input_ids']
+        chunk_size = self.chunk_tokens - self.special_tokens
+        chunks = [token_ids[start:start + chunk_size] for start in range(0, len(token_ids), chunk_size)] or [[]]
+        return [self.tokenizer.build_inputs_with_special_tokens(chunk) for chunk in chunks]
+
+    def generate(self, sequences: List[List[int]], max_length: int, min_length: int) -> List[str]:
+        """Summarizes token id sequences in length buckets and returns summaries in the input order."""
+        summaries = [None] * len(sequences)
+
+        for batch in length_buckets([len(sequence) for sequence in sequences], self.max_tokens_per_batch):
+            inputs = pad_sequences([sequences[i] for i in batch], self.pad_token_id)
+            with Instrumentation.stage("summarization.batch", items=len(batch)), torch.inference_mode():
+                output_ids = self.model.generate(**inputs, max_length=max_length, min_length=min_length, do_sample=False)
+            for index, summary in zip(batch, self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)):
+                summaries[index] = summary.strip()
+
+        return summaries
+
+    def _summarize_uncached(self, texts: List[str], max_length: int, min_length: int) -> List[str]:
+        summaries = [None] * len(texts)
+        pending = {index: self.chunk(text) for index, text in enumerate(texts)}
+
+        while pending:
+            # documents fitting into a single chunk get their final summary, the rest is reduced further
+            final = [(index, chunks[0]) for index, chunks in pending.items() if len(chunks) == 1]
+            partial = [(index, chunk) for index, chunks in pending.items() if len(chunks) > 1 for chunk in chunks]
+
+            if final:
+                for (index, _), summary in zip(final, self.generate([chunk for _, chunk in final], max_length, min_length)):
+                    summaries[index] = summary
+
+            chunk_summaries = {}
+            if partial:
+                # chunk summaries only need to be short, a forced minimum length would pad short tail chunks
+                for (index, _), summary in zip(partial, self.generate([chunk for _, chunk in partial], max_length, 0)):
+                    chunk_summaries.setdefault(index, []).append(summary)
+
+            pending = {index: self.chunk(" ".join(parts)) for index, parts in chunk_summaries.items()}
+
+        return summaries
+
+    def summarize(self, texts: List[str], max_length: int = 150, min_length: int = 40) -> List[str]:
+        """Summarizes texts of any length and returns one summary per text in the input order."""
+        if not texts:
+            return []
+        if max_length * 2 > self.chunk_tokens:
+            # every reduce round has to at least halve the document, otherwise it would never fit into one chunk
+            raise ValueError("Argument 'max_length' must be at most half of 'chunk_tokens'.")
+
+        # generation settings are part of the cached content, summaries of other lengths are cached separately
+        cache_texts = [f"{max_length}:{min_length}:{text}" for text in texts]
+        summaries = [None] * len(texts)
+        if self.cache is not None:
+            for index, summary in self.cache.get_many(cache_texts).items():
+                summaries[index] = summary
+
+        # identical texts within one call are summarized only once
+        missed_indices = {}
+        for index, text in enumerate(texts):
+            if summaries[index] is None:
+                missed_indices.setdefault(text, []).append(index)
+
+        if missed_indices:
+            missed_texts = list(missed_indices)
+            new_summaries = self._summarize_uncached(missed_texts, max_length, min_length)
+            if self.cache is not None:
+                self.cache.put_many([cache_texts[missed_indices[text][0]] for text in missed_texts], new_summaries)
+
+            for text, summary in zip(missed_texts, new_summaries):
+                for index in missed_indices[text]:
+                    summaries[index] = summary
+
+        return summaries
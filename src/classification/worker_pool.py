@@ -0,0 +1,121 @@
+import atexit
+import multiprocessing
+import os
+from typing import Callable, Dict, List, Tuple, Union
+import torch
+from utils.instrumentation import Instrumentation
+
+
+# Engine of a worker process, built once per worker by `_init_worker`. Never set in the parent process.
+_WORKER_ENGINE = None
+# Error which prevented the worker from building its engine
+_WORKER_ERROR = None
+
+
+def _init_worker(classifier_factory: Callable, num_threads: int, jsonl_path: Union[str, None]):
+    global _WORKER_ENGINE, _WORKER_ERROR
+    try:
+        # set before the model is built, so the weights are loaded with the worker's share of the cores
+        torch.set_num_threads(num_threads)
+        # stages and events of the worker are returned with every result and recorded by the parent process
+        Instrumentation.forward_to_parent(jsonl_path)
+        _WORKER_ENGINE = classifier_factory(num_threads=num_threads).engine
+        Instrumentation.drain()
+    except Exception as e:
+        # a raising initializer makes the pool respawn the worker forever, the error is raised by its tasks instead
+        _WORKER_ERROR = f"{type(e).__name__}: {e}"
+
+
+def _check_worker():
+    if _WORKER_ENGINE is None:
+        raise RuntimeError(f"Inference worker failed to load the model: {_WORKER_ERROR}")
+
+
+def _infer_batch(task: Tuple[int, List[List[int]]]) -> Tuple[int, List[dict], tuple]:
+    _check_worker()
+    batch_id, sequences = task
+    classifications = _WORKER_ENGINE.infer_batch(sequences)
+    return batch_id, classifications, Instrumentation.drain()
+
+
+class InferenceWorkerPool:
+    POOLS: Dict[Tuple[str, int], "InferenceWorkerPool"] = {}
+
+    def __init__(self, engine, num_processes: int, classifier_factory: Callable, threads_per_worker: Union[int, None] = None):
+        """
+        Persistent pool of inference worker processes sharing a single model.
+
+        Workers receive only token id batches, never the model itself. Workers are started with
+        `forkserver` (`spawn` where unavailable) rather than `fork`, because forking a process which
+        already runs torch threads can deadlock the children. Every worker builds the model once
+        with `classifier_factory`, which must be picklable (e.g. a partial of the classifier class).
+
+        Args:
+            engine (BatchInferenceEngine): Engine of the already loaded model, used for batching.
+            num_processes (int): Number of worker processes.
+            classifier_factory (Callable): Builds a classifier exposing `engine` in every worker, called with the `num_threads` keyword.
+            threads_per_worker (int): Intra-op threads per worker (torch and ONNX Runtime). Defaults to splitting the CPU cores evenly.
+
+        Raises:
+            RuntimeError: If the workers fail to load the model.
+        """
+        if num_processes < 1:
+            raise ValueError("Value for argument 'num_processes' must be at least 1.")
+
+        self.engine = engine
+        self.num_processes = num_processes
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_processes)
+
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        context = multiprocessing.get_context(start_method)
+        self.pool = context.Pool(num_processes, initializer=_init_worker, initargs=(classifier_factory, self.threads_per_worker, Instrumentation.JSONL_PATH))
+        try:
+            # handshake before any batch is dispatched, a worker without a model fails instead of hanging the caller
+            self.pool.apply(_check_worker)
+        except Exception:
+            self.pool.terminate()
+            self.pool.join()
+            raise
+
+    @staticmethod
+    def get(name: str, engine, num_processes: int, classifier_factory: Callable) -> "InferenceWorkerPool":
+        """Returns the pool serving the model `name` with `num_processes` workers, starting it on first use."""
+        key = (name, num_processes)
+        if key not in InferenceWorkerPool.POOLS:
+            InferenceWorkerPool.POOLS[key] = InferenceWorkerPool(engine, num_processes, classifier_factory)
+        return InferenceWorkerPool.POOLS[key]
+
+    def classify_token_ids(self, sequences: List[List[int]]) -> List[dict]:
+        """Distributes length-bucketed batches across the workers and returns results in the input order."""
+        batches = self.engine.make_batches([len(sequence) for sequence in sequences])
+        tasks = [(batch_id, [sequences[i] for i in batch]) for batch_id, batch in enumerate(batches)]
+
+        classifications = [None] * len(sequences)
+        # chunksize=1 lets idle workers pick up the next bucket as soon as they are done
+        for batch_id, batch_classifications, (worker_stages, worker_events) in self.pool.imap_unordered(_infer_batch, tasks, chunksize=1):
+            Instrumentation.merge(worker_stages, worker_events)
+            for index, classification in zip(batches[batch_id], batch_classifications):
+                classifications[index] = classification
+
+        return classifications
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    @staticmethod
+    def shutdown(name: str):
+        """Stops every pool serving the model `name`."""
+        for key, worker_pool in list(InferenceWorkerPool.POOLS.items()):
+            if key[0] == name:
+                worker_pool.close()
+                del InferenceWorkerPool.POOLS[key]
+
+    @staticmethod
+    def shutdown_all():
+        for key, worker_pool in list(InferenceWorkerPool.POOLS.items()):
+            worker_pool.close()
+            del InferenceWorkerPool.POOLS[key]
+
+
+atexit.register(InferenceWorkerPool.shutdown_all)
@@ -0,0 +1,82 @@
+import hashlib
+import random
+import re
+from typing import Dict, Hashable, List, Set, Union
+
+
+class MinHashLSHIndex:
+    # Mersenne prime larger than any 64-bit shingle hash
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 2, threshold: float = 0.8, seed: int = 1):
+        """
+        In-memory MinHash/LSH index for near-duplicate text detection.
+
+        Texts are reduced to word shingles (punctuation, emojis and other non-word characters
+        are ignored), summarized with a MinHash signature, and bucketed by signature bands.
+        A text is a near-duplicate of an indexed text when they share a band bucket and
+        their estimated Jaccard similarity reaches `threshold`.
+
+        Args:
+            num_perm (int): Number of hash permutations in a signature.
+            bands (int): Number of LSH bands, must divide `num_perm`.
+            shingle_size (int): Number of consecutive words in a shingle.
+            threshold (float): Minimal estimated Jaccard similarity of near-duplicates.
+            seed (int): Seed of the permutation coefficients.
+        """
+        if num_perm % bands != 0:
+            raise ValueError("Argument 'num_perm' must be divisible by 'bands'.")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.word_pattern = re.compile(r'\w+')
+
+        rng = random.Random(seed)
+        self.permutations = [(rng.randrange(1, self.PRIME), rng.randrange(0, self.PRIME)) for _ in range(num_perm)]
+
+        self.buckets: List[Dict[tuple, List[Hashable]]] = [{} for _ in range(bands)]
+        self.signatures: Dict[Hashable, List[int]] = {}
+
+    def _shingles(self, text: str) -> Set[int]:
+        words = self.word_pattern.findall(text.lower())
+        if len(words) <= self.shingle_size:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+        return {int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little") for shingle in shingles}
+
+    def signature(self, text: str) -> List[int]:
+        """Returns the MinHash signature of the text."""
+        shingles = self._shingles(text)
+        return [min((a * shingle + b) % self.PRIME for shingle in shingles) for a, b in self.permutations]
+
+    def _similarity(self, signature: List[int], other: List[int]) -> float:
+        return sum(1 for x, y in zip(signature, other) if x == y) / self.num_perm
+
+    def query_or_add(self, key: Hashable, text: str) -> Union[Hashable, None]:
+        """
+        Returns the key of an indexed near-duplicate of the text, or indexes the text under
+        `key` and returns None when no near-duplicate exists.
+        """
+        signature = self.signature(text)
+        band_keys = [tuple(signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+        checked = set()
+        for band, band_key in enumerate(band_keys):
+            for candidate in self.buckets[band].get(band_key, []):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if self._similarity(signature, self.signatures[candidate]) >= self.threshold:
+                    return candidate
+
+        self.signatures[key] = signature
+        for band, band_key in enumerate(band_keys):
+            self.buckets[band].setdefault(band_key, []).append(key)
+        return None
+
+    def __len__(self):
+        return len(self.signatures)
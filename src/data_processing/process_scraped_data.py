@@ -1,35 +1,78 @@
 import data_processing.text_processing as text_processing
 from mongodb.scraped_data_fetcher import get_todays_scraped_data, ScrapedDataFetcher
 from mongodb.mongo_connector import MongoDatabase
+from mongodb.ticker_index import TickerIndex
+import os
+from typing import Iterable, Iterator, List, Union
+from utils.batching import batched
+from utils.instrumentation import Instrumentation
+
+# number of processes cleaning tweet contents, 1 cleans in the calling process
+CLEANING_PROCESSES = int(os.environ.get("CLEANING_PROCESSES", 1))
 
 article_processor = text_processing.ArticleProcessor()
+tweet_processor = text_processing.TweetProcessor()
 mongo_connector = MongoDatabase()
+ticker_index = TickerIndex()
+
+def _prepare_tweets(tweet_processor: text_processing.TweetProcessor, tweets: List[dict]) -> List[dict]:
+    """ Cleans contents of the tweets valid for classification in place and returns them, invalid tweets are dropped.
+        Cashtags and hashtags are extracted before cleaning strips them from the content.
+    """
+    valid_tweets = [tweet for tweet in tweets if tweet_processor.validate_tweet(tweet['content'])]
+    for tweet in valid_tweets:
+        tweet.update(tweet_processor.extract_tags(tweet['content']))
+
+    cleaned_contents = tweet_processor.clean_batch([tweet['content'] for tweet in valid_tweets], num_processes=CLEANING_PROCESSES)
+    for tweet, cleaned_content in zip(valid_tweets, cleaned_contents):
+        tweet['content'] = cleaned_content
+        tweet.pop('_id', None)
+        tweet.pop('type', None)
+    return valid_tweets
+
+
+def iter_processed_tweets(tweets: Iterable[dict], batch_size: int = 256) -> Iterator[dict]:
+    """ Lazily cleans and validates a stream of scraped tweets, `batch_size` tweets at a time. """
+    for batch in batched(tweets, batch_size):
+        yield from _prepare_tweets(tweet_processor, batch)
+
 
 def process_tweets(tweets):
-    tweet_processor = text_processing.TweetProcessor()
-    
-    tweets_to_save = []
-    for tweet in tweets:
-        tweet_content = tweet['content']
-        preprocessed_content = tweet_processor.remove_urls_hashtags_endline_chars(tweet_content)
-        if tweet_processor.validate_tweet(tweet_content):
-            tweet['content'] = preprocessed_content 
-            del tweet['_id']
-            del tweet['type']
-            tweets_to_save.append(tweet)
+    with Instrumentation.stage("pipeline.clean", items=len(tweets)):
+        tweets_to_save = _prepare_tweets(tweet_processor, tweets)
+        tweet_processor.mark_near_duplicates(tweets_to_save)
     mongo_connector.insert_many("tweets", tweets_to_save)
+    ticker_index.add(tweets_to_save)
     return tweets_to_save
 
 
+def _prepare_article(article_processor: text_processing.ArticleProcessor, article: dict) -> Union[dict, None]:
+    """ Cleans the article's content in place, returns None if the article is not valid for classification. """
+    article_content = article.get('content')
+    if not article_processor.validate_article(article_content):
+        return None
+    article['content'] = article_processor.remove_urls_hashtags_endline_chars(article_content)
+    # articles are upserted by `id`, the scraped document's id is used when the source has none
+    article.setdefault('id', str(article.get('_id')))
+    article.pop('_id', None)
+    article.pop('type', None)
+    return article
+
+
 def process_articles(articles):
-    article_content = article['content']
-    for article in articles:
-        pass
-    return 0 
+    articles_to_save = []
+    with Instrumentation.stage("pipeline.clean_articles", items=len(articles)):
+        for article in articles:
+            prepared_article = _prepare_article(article_processor, article)
+            if prepared_article is not None:
+                articles_to_save.append(prepared_article)
+    return articles_to_save
 
 def return_proceessed_tweets_and_articles():
     data = {}
-    scraped_data = get_todays_scraped_data()
+    with Instrumentation.stage("pipeline.fetch") as stage:
+        scraped_data = get_todays_scraped_data()
+        stage.items = sum(len(documents) for documents in scraped_data.values())
 
     if 'tweets' in scraped_data and len(scraped_data['tweets']) > 0 :
         valid_tweets = process_tweets(scraped_data['tweets'])
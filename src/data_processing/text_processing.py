@@ -1,7 +1,10 @@
+import atexit
+import math
+import multiprocessing
 import re 
 from typing import List, Dict
-from transformers import RobertaTokenizer
-import torch
+from data_processing.near_duplicates import MinHashLSHIndex
+
 
 class TextProcessor():
     def __init__(self):
@@ -9,6 +12,15 @@ class TextProcessor():
         self.hashtag_pattern = re.compile(r'#(\w+)')
         self.cashtag_pattern = re.compile(r'\$([A-Za-z][A-Za-z0-9_]*)\b')
         self.endline_char_pattern = re.compile(r'\n+')
+        # Single-pass equivalent of the four patterns above. URLs are removed first in the sequential chain,
+        # so hashtags and cashtags stop right before an embedded URL and newline runs separated only by
+        # URLs collapse into a single space, exactly as if the URLs had been removed beforehand.
+        self.fused_pattern = re.compile(
+            r'(?P<endline>\n(?:\n|https?://\S+)*)'
+            r'|(?P<url>https?://\S+)'
+            r'|#(?P<hashtag>(?:(?!https?://\S)\w)+)'
+            r'|\$(?P<cashtag>(?!https?://\S)[A-Za-z](?:(?!https?://\S)[A-Za-z0-9_])*)(?:\b|(?=https?://\S))'
+        )
 
     def _remove_url(self, text: str):
         return self.url_pattern.sub('', text)
@@ -25,8 +37,16 @@ class TextProcessor():
     def _remove_endline_chars(self, text: str):
         return self.endline_char_pattern.sub(' ', text)
 
-    def remove_urls_hashtags_endline_chars(self, text: str):
-        """ Removes from the text URLs, Hashtags, Cashtags, and endline chars. Converts text to lowercase. """
+    @staticmethod
+    def _fused_replacement(match: re.Match) -> str:
+        kind = match.lastgroup
+        if kind == 'url':
+            return ''
+        if kind == 'endline':
+            return ' '
+        return match.group(kind)
+
+    def _clean_sequentially(self, text: str):
         cleaned_text = self._remove_url(text)
         cleaned_text = self._remove_hashtags(cleaned_text)
         cleaned_text = self._remove_cashtags(cleaned_text)
@@ -34,20 +54,101 @@ class TextProcessor():
         cleaned_text = self._remove_endline_chars(cleaned_text)
         return cleaned_text
 
+    def remove_urls_hashtags_endline_chars(self, text: str):
+        """ Removes from the text URLs, Hashtags, Cashtags, and endline chars. Converts text to lowercase. """
+        # A hashtag removed right after `$` (or a non-ASCII hashtag right after a cashtag) changes which
+        # cashtag the sequential chain sees, these rare texts are cleaned with the original chain.
+        if '$' in text and '#' in text and ('$#' in text or not text.isascii()):
+            return self._clean_sequentially(text)
+        return self.fused_pattern.sub(self._fused_replacement, text).lower()
+
+    def extract_tags(self, text: str) -> Dict[str, List[str]]:
+        """ Returns unique cashtags (uppercase tickers, e.g. `BTC`) and hashtags (lowercase) of the text, ignoring URLs. """
+        text_without_urls = self._remove_url(text)
+        cashtags = dict.fromkeys(tag.upper() for tag in self.cashtag_pattern.findall(text_without_urls))
+        hashtags = dict.fromkeys(tag.lower() for tag in self.hashtag_pattern.findall(text_without_urls))
+        return {"cashtags": list(cashtags), "hashtags": list(hashtags)}
+
+    def clean_batch(self, texts: List[str], num_processes: int = 1, chunksize: int = 256) -> List[str]:
+        """
+        Clean a list of texts with `remove_urls_hashtags_endline_chars`.
+
+        Args:
+            texts (List[str]): Texts to clean.
+            num_processes (int): Number of worker processes, useful for large backfills.
+            chunksize (int): Number of texts sent to a worker at once.
+
+        Returns:
+            List[str]: Cleaned texts in the input order.
+        """
+        if num_processes < 1:
+            raise ValueError("Value for argument 'num_processes' must be at least 1.")
+
+        if num_processes == 1 or len(texts) <= chunksize:
+            return [self.remove_urls_hashtags_endline_chars(text) for text in texts]
+
+        return _get_cleaning_pool(num_processes).map(_clean_text, texts, chunksize=chunksize)
+
+
+_BATCH_TEXT_PROCESSOR = TextProcessor()
+# persistent cleaning pools by number of processes, started on first use
+_CLEANING_POOLS = {}
+
+
+def _clean_text(text: str) -> str:
+    return _BATCH_TEXT_PROCESSOR.remove_urls_hashtags_endline_chars(text)
+
+
+def _get_cleaning_pool(num_processes: int):
+    if num_processes not in _CLEANING_POOLS:
+        # like the inference workers, never fork a process which may already run torch threads
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _CLEANING_POOLS[num_processes] = multiprocessing.get_context(start_method).Pool(num_processes)
+    return _CLEANING_POOLS[num_processes]
+
+
+def shutdown_cleaning_pools():
+    for num_processes, pool in list(_CLEANING_POOLS.items()):
+        pool.close()
+        pool.join()
+        del _CLEANING_POOLS[num_processes]
+
+
+atexit.register(shutdown_cleaning_pools)
 
 
 class TweetProcessor(TextProcessor):
+    # tokenizers shared by all processor instances, loaded on first tokenization
+    _TOKENIZERS = {}
+
     def __init__(self, max_len: int = 128, tokenization_model: str = "ElKulako/cryptobert"):
         """
         Initialize the TweetProcessor with a specified tokenization model.
 
+        The tokenizer is not loaded here, but on the first tokenization, so processors used only
+        for cleaning and validation start without loading any model assets.
+
         Args:
             tokenization_model (str): The model name for tokenization.
-            max_len (int): Maximum length of the tweet.
+            max_len (int): Maximum length of the tweet in tokens.
         """
         super().__init__()  
-        self.tokenizer = RobertaTokenizer.from_pretrained(tokenization_model)
+        self.tokenization_model = tokenization_model
         self.max_len = max_len
+
+    @property
+    def tokenizer(self):
+        if self.tokenization_model not in TweetProcessor._TOKENIZERS:
+            from transformers import AutoTokenizer
+            TweetProcessor._TOKENIZERS[self.tokenization_model] = AutoTokenizer.from_pretrained(self.tokenization_model, use_fast=True)
+        return TweetProcessor._TOKENIZERS[self.tokenization_model]
+
+    @staticmethod
+    def _estimate_token_count(tweet: str) -> int:
+        """Cheap upper-bound-leaning estimate of the number of tokens, without running the tokenizer."""
+        # BPE tokenizers produce roughly one token per 4 characters of English text and at least
+        # one token per word, plus the two special tokens added around every input
+        return max(len(tweet.split()), math.ceil(len(tweet) / 4)) + 2
     
     def _is_valid_length(self, tweet: str, min_words: int = 3) -> bool:
         """       
@@ -55,24 +156,18 @@ class TweetProcessor(TextProcessor):
 
         Args:
             tweet (str): The tweet text.
-            max_len (int): Maximum allowed length of the tweet.
             min_words (int): Minimum required number of words in the tweet.
 
         Returns:
             bool: True if valid, False otherwise.
         """
         words = len(tweet.split())
-        return len(tweet) < self.max_len and words >= min_words
+        return self._estimate_token_count(tweet) <= self.max_len and words >= min_words
 
     def _check_if_retweet(self, tweet: str) -> bool:
         """Check if the tweet is a retweet."""
         return not tweet.startswith("RT ")
     
-    def _tokenize_single_tweet(self, text: str) -> Dict[str, torch.Tensor]:
-        """Tokenize a single tweet and return the tokenized inputs."""
-        inputs = self.tokenizer(text, max_length=self.max_len, padding="max_length", truncation=True, return_tensors="pt")
-        return inputs
-
     def validate_tweet(self, tweet: str) -> bool:
         """Validate if the tweet is suitable for saving and sentiment classification."""
         if not self._check_if_retweet(tweet):
@@ -83,14 +178,37 @@ class TweetProcessor(TextProcessor):
         
         return True 
 
-    def prepare_inputs_for_model(self, text: List[str]) -> List[Dict[str, torch.Tensor]]:
-        """Tokenize a list of tweets and return a list of tokenized inputs."""
-        inputs_list = []
-        for tweet in text:
-            inputs = self._tokenize_single_tweet(tweet)
-            inputs_list.append(inputs)
+    def prepare_inputs_for_model(self, text: List[str]) -> List[List[int]]:
+        """
+        Tokenize a list of tweets in a single call of the fast tokenizer.
 
-        return inputs_list
+        Returns unpadded token ids of every tweet, truncated to `max_len`, which `TweetSentimentClassifier.classify_sentiment`
+        accepts directly. Padding is left to the batch inference engine, which pads every length bucket on its own.
+        """
+        if not text:
+            return []
+        return self.tokenizer(text, max_length=self.max_len, truncation=True, padding=False)['input_ids']
+
+    def mark_near_duplicates(self, tweets: List[dict], threshold: float = 0.8) -> List[dict]:
+        """
+        Mark near-duplicate tweets (e.g. templated bot posts differing only by a URL or emoji).
+
+        The first tweet of every cluster is kept as its representative, every other tweet of the
+        cluster gets a `duplicate_of` key with the representative's `tweet_id`. The index is scoped
+        to the given tweets only.
+        """
+        index = MinHashLSHIndex(threshold=threshold)
+        for tweet in tweets:
+            representative_id = index.query_or_add(tweet['tweet_id'], tweet['content'])
+            if representative_id is not None:
+                tweet['duplicate_of'] = representative_id
+        return tweets
 
 class ArticleProcessor(TextProcessor):
-    pass
+    def __init__(self, min_words: int = 20):
+        super().__init__()
+        self.min_words = min_words
+
+    def validate_article(self, article: str) -> bool:
+        """Validate if the article has enough content for sentiment classification."""
+        return isinstance(article, str) and len(article.split()) >= self.min_words
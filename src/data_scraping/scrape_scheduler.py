@@ -0,0 +1,118 @@
+import asyncio
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Union
+from utils.instrumentation import Instrumentation
+
+
+@dataclass
+class AccountScrapeStats:
+    """Class representing the outcome of scraping a single followed account."""
+    user_id: int
+    tweets: int = 0
+    attempts: int = 0
+    latency_seconds: float = 0.0
+    error: Union[str, None] = None
+
+
+class RateBudgetPool:
+    def __init__(self, scraping_accounts: List[str], requests_per_window: int, window_seconds: float):
+        """
+        Sliding-window request budgets of the scraping accounts.
+
+        Every scraping account (a twscrape account username) may send at most `requests_per_window`
+        requests per `window_seconds`. A request is charged to the account whose budget frees up first,
+        and waits when all of them are exhausted. twscrape picks the account actually sending the request,
+        so the pool bounds the total request rate of all accounts rather than pinning requests to accounts.
+        """
+        if not scraping_accounts:
+            raise ValueError("Argument 'scraping_accounts' must contain at least one account.")
+
+        self.requests_per_window = requests_per_window
+        self.window_seconds = window_seconds
+        self.budgets = {account: deque() for account in scraping_accounts}
+        self._lock = asyncio.Lock()
+
+    def _wait_time(self, budget: deque, now: float) -> float:
+        while budget and now - budget[0] >= self.window_seconds:
+            budget.popleft()
+        if len(budget) < self.requests_per_window:
+            return 0.0
+        return self.window_seconds - (now - budget[0])
+
+    async def acquire(self) -> str:
+        """ Charges one request to a scraping account, waiting until a budget frees up. Returns the charged account. """
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                wait_time, account = min(((self._wait_time(budget, now), account) for account, budget in self.budgets.items()), key=lambda item: item[0])
+                if wait_time <= 0:
+                    self.budgets[account].append(now)
+                    return account
+            # sleeping outside the lock lets other waiters re-check the budgets in the meantime
+            await asyncio.sleep(wait_time)
+
+
+class ScrapeScheduler:
+    def __init__(self, fetch: Callable[[int, Callable[[], Awaitable]], Awaitable[List[dict]]], persist: Callable[[List[dict]], Awaitable], scraping_accounts: List[str], max_concurrency: int = 4, requests_per_window: int = 50, window_seconds: float = 900, max_retries: int = 3, backoff_base: float = 2.0):
+        """
+        Scheduler scraping followed accounts with bounded concurrency and rate budgets.
+
+        At most `max_concurrency` accounts are scraped at once, every request (timeline page) of a fetch
+        is charged to a scraping account budget, failed fetches are retried with exponential backoff, and the tweets of every
+        account are persisted as soon as they arrive, so one slow account delays nothing else and a
+        crash loses at most the accounts still in flight.
+
+        Args:
+            fetch (Callable): Coroutine function returning tweets of a followed account id, awaiting the
+                given `acquire` coroutine function before every request it sends.
+            persist (Callable): Coroutine function saving a list of tweets.
+            scraping_accounts (List[str]): Usernames of the scraping accounts sharing the request budget.
+            max_concurrency (int): Maximum number of accounts scraped concurrently.
+            requests_per_window (int): Request budget of a single scraping account per window.
+            window_seconds (float): Length of the rate limit window.
+            max_retries (int): Number of retries of a failed fetch.
+            backoff_base (float): Base of the exponential backoff in seconds.
+        """
+        self.fetch = fetch
+        self.persist = persist
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.rate_budget = RateBudgetPool(scraping_accounts, requests_per_window, window_seconds)
+
+    async def _scrape_account(self, user_id: int, semaphore: asyncio.Semaphore) -> AccountScrapeStats:
+        stats = AccountScrapeStats(user_id=user_id)
+        async with semaphore:
+            start = time.perf_counter()
+            while True:
+                stats.attempts += 1
+                try:
+                    tweets = await self.fetch(user_id, self.rate_budget.acquire)
+                    break
+                except Exception as e:
+                    if stats.attempts > self.max_retries:
+                        stats.error = str(e)
+                        stats.latency_seconds = time.perf_counter() - start
+                        return stats
+                    backoff = self.backoff_base ** (stats.attempts - 1)
+                    await asyncio.sleep(backoff + random.uniform(0, backoff / 2))
+
+            stats.latency_seconds = time.perf_counter() - start
+            Instrumentation.record("scrape.account", stats.latency_seconds, len(tweets))
+
+        if tweets:
+            try:
+                await self.persist(tweets)
+                stats.tweets = len(tweets)
+            except Exception as e:
+                stats.error = f"Saving tweets failed: {e}"
+        return stats
+
+    async def run(self, accounts: List[int]) -> List[AccountScrapeStats]:
+        """Scrapes all accounts and returns per-account stats in the order of `accounts`."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [self._scrape_account(user_id, semaphore) for user_id in accounts]
+        return await asyncio.gather(*tasks)
@@ -1,21 +1,31 @@
-import tracemalloc
-tracemalloc.start()
 from twscrape import API
-import asyncio 
-from typing import List
+from twscrape.models import parse_tweets
+from typing import Awaitable, Callable, List, Union
 import datetime  
-from mongodb import mongo_connector
+from mongodb.async_mongo_connector import AsyncMongoDatabase
 from mongodb.twitter_info_config import TwitterAccount
+from mongodb.scrape_state import ScrapeStateStore
+from data_scraping.scrape_scheduler import ScrapeScheduler, AccountScrapeStats
 from utils.date_utils import TIMEZONE
+from utils.instrumentation import Instrumentation
+import os
+
+TWSCRAPE_ACCOUNTS_DB = os.environ.get("TWSCRAPE_ACCOUNTS_DB", "accounts.db")
 
 
 class TwitterScraper():
     """Class representing Twitter Scraper inheriting from twscrape API object"""
-    def __init__(self, user_list: List[TwitterAccount], collection_name='scraped_data'):
+    def __init__(self, user_list: List[TwitterAccount], collection_name='scraped_data', max_concurrency: int = 4, requests_per_window: int = 50, window_seconds: float = 900, accounts_db_path: str = TWSCRAPE_ACCOUNTS_DB):
         self.user_list = user_list
         self.collection_name = collection_name
-        self.api = API()
-        self.db_connector = mongo_connector.MongoDatabase()
+        self.max_concurrency = max_concurrency
+        self.requests_per_window = requests_per_window
+        self.window_seconds = window_seconds
+        # sessions (cookies) of the scraping accounts are persisted in this database between runs
+        self.api = API(pool=accounts_db_path)
+        self.reused_sessions = 0
+        self.db_connector = AsyncMongoDatabase()
+        self.scrape_state = ScrapeStateStore()
 
 
     async def initialize(self):
@@ -24,9 +34,31 @@ class TwitterScraper():
 
 
     async def _prepare_all_accounts(self):
+        """ Reuses sessions stored in the twscrape accounts database, logging in only accounts without a valid session. """
+        stored_accounts = {account.username: account for account in await self.api.pool.get_all()}
+
+        usernames_to_login = []
         for user in self.user_list: 
-            await self.api.pool.add_account(user.tt_name, user.tt_password, user.email, user.email_password)
-        await self.api.pool.login_all()
+            account = stored_accounts.get(user.tt_name)
+            if account is None:
+                await self.api.pool.add_account(user.tt_name, user.tt_password, user.email, user.email_password)
+                usernames_to_login.append(user.tt_name)
+            elif not self._has_valid_session(account):
+                usernames_to_login.append(user.tt_name)
+
+        if usernames_to_login:
+            with Instrumentation.stage("scrape.login", items=len(usernames_to_login)):
+                await self.api.pool.relogin(usernames_to_login)
+
+        self.reused_sessions = len(self.user_list) - len(usernames_to_login)
+        print(f"Reused {self.reused_sessions} scraping account sessions, logged in {len(usernames_to_login)} accounts")
+
+
+    @staticmethod
+    def _has_valid_session(account) -> bool:
+        """ Cheap local check of a stored session, without any request to Twitter. """
+        cookies = account.cookies or {}
+        return account.active and "auth_token" in cookies and "ct0" in cookies
 
 
     async def get_user_id(self, login) -> int:
@@ -35,31 +67,87 @@ class TwitterScraper():
         return user.id 
     
 
-    async def get_todays_users_posts(self, user_id, limit=5) -> List[dict]:
-        """ Returns user's twitter posts from the current day. """
-        user_tweets = []
+    async def get_todays_users_posts(self, user_id, acquire: Union[Callable[[], Awaitable], None] = None, limit=-1) -> List[dict]:
+        """ Returns user's twitter posts from the current day which were not scraped yet.
+
+            Tweets of a page are not in timeline order (twscrape also returns the older originals behind
+            retweets and quotes), so every page is read whole. The timeline is paginated until a page whose
+            own non-pinned tweets are all older than the account's high-water mark (or older than today),
+            `limit=-1` means no fixed cap on the number of fetched tweets.
+            `acquire` is awaited before every requested timeline page, so rate budgets are charged per request.
+        """
+        user_tweets = {}
         today = datetime.datetime.now(TIMEZONE).date()
+        high_water_mark = await self.scrape_state.get_high_water_mark(user_id)
+        last_tweet_id = high_water_mark['last_tweet_id'] if high_water_mark else None
+
+        def is_new(tweet) -> bool:
+            return tweet.date.astimezone(TIMEZONE).date() == today and (last_tweet_id is None or tweet.id > last_tweet_id)
+
+        pages = self.api.user_tweets_raw(user_id, limit=limit)
+        try:
+            while True:
+                if acquire is not None:
+                    await acquire()
+                # the next page is requested only here, after its request was charged
+                try:
+                    page = await pages.__anext__()
+                except StopAsyncIteration:
+                    break
+
+                # originals of retweets and quotes are authored by other accounts
+                own_tweets = [tweet for tweet in parse_tweets(page, limit) if tweet.user.id == user_id]
+                for tweet in own_tweets:
+                    if is_new(tweet):
+                        user_tweets[tweet.id] = {
+                            "type": "tweet",
+                            "tweet_id": tweet.id,
+                            "tweet_creator_id": user_id,
+                            "tweet_creator_username": tweet.user.username, 
+                            "created": tweet.date, 
+                            "content": tweet.rawContent
+                        }
+
+                # a pinned tweet stays on top of the timeline, it says nothing about the age of the page
+                timeline_tweets = [tweet for tweet in own_tweets if tweet.id not in (tweet.user.pinnedIds or [])]
+                if timeline_tweets and not any(is_new(tweet) for tweet in timeline_tweets):
+                    break
+        finally:
+            await pages.aclose()
+
+        return await self._drop_already_saved(list(user_tweets.values()))
+
+
+    async def _drop_already_saved(self, tweets: List[dict]) -> List[dict]:
+        if not tweets:
+            return tweets
+        query = {"type": "tweet", "tweet_id": {"$in": [tweet['tweet_id'] for tweet in tweets]}}
+        saved_tweet_ids = {tweet['tweet_id'] for tweet in await self.db_connector.find(self.collection_name, query)}
+        return [tweet for tweet in tweets if tweet['tweet_id'] not in saved_tweet_ids]
+
+
+    async def _save_tweets(self, tweets: List[dict]):
+        # upserts keyed by tweet id make a retried save idempotent, and unlike `insert_many` report failed writes
+        operations = [({"type": "tweet", "tweet_id": tweet['tweet_id']}, tweet) for tweet in tweets]
+        result = await self.db_connector.bulk_upsert(self.collection_name, operations)
+        if not result.ok:
+            raise RuntimeError(f"Saving tweets into `{self.collection_name}` failed: {[error.message for error in result.errors]}")
+        # the mark moves only after the write is confirmed, so a failed save never skips unsaved tweets
+        await self.scrape_state.update_high_water_mark(tweets[0]['tweet_creator_id'], tweets)
+
 
-        async for tweet in API.user_tweets(self.api, uid=user_id, limit=limit):
-            tweet_date_desired_timezone = tweet.date.astimezone(TIMEZONE).date()
-            if tweet_date_desired_timezone == today:
-                tweet_data = {
-                    "type": "tweet",
-                    "tweet_id": tweet.id,
-                    "tweet_creator_id": user_id,
-                    "tweet_creator_username": tweet.user.username, 
-                    "created": tweet.date, 
-                    "content": tweet.rawContent
-                }
-                user_tweets.append(tweet_data)
-
-        return user_tweets 
-
-
-    async def get_todays_tweets_from_accounts_bulk(self, accounts: List[int]):
-        """ Retrieves all today's tweets from all accounts provided in the 'followed_account_ids' and saves them into MongoDB """
-        all_tweets = []
-        tasks = [self.get_todays_users_posts(user_id) for user_id in accounts]
-        all_tweets_lists = await asyncio.gather(*tasks)
-        all_tweets = [tweet for tweets_list in all_tweets_lists for tweet in tweets_list]
-        self.db_connector.insert_many(self.collection_name, all_tweets)
+    async def get_todays_tweets_from_accounts_bulk(self, accounts: List[int]) -> List[AccountScrapeStats]:
+        """ Retrieves all today's tweets from all accounts provided in the 'followed_account_ids' and saves them into MongoDB.
+            Tweets of every account are saved as soon as the account is scraped. Returns per-account scraping stats.
+        """
+        # budgets belong to the twscrape accounts able to send requests, accounts still logging in fall back to the configured ones
+        scraping_accounts = [account.username for account in await self.api.pool.get_all() if account.active]
+        scheduler = ScrapeScheduler(
+            fetch=self.get_todays_users_posts,
+            persist=self._save_tweets,
+            scraping_accounts=scraping_accounts or [user.tt_name for user in self.user_list],
+            max_concurrency=self.max_concurrency,
+            requests_per_window=self.requests_per_window,
+            window_seconds=self.window_seconds
+        )
+        return await scheduler.run(accounts)
@@ -1,11 +1,23 @@
+import argparse
 import asyncio
+import tracemalloc
+from datetime import datetime
 import data_scraping.twitter_api as tt_api
 import mongodb.twitter_info_config  as twitter_info_config
 import mongodb.mongo_connector as mongo_connector
-from mongodb.mongo_models import DailySentimentObj
+from mongodb.mongo_models import BulkUpsertResult
 from data_processing.process_scraped_data import return_proceessed_tweets_and_articles
-from classification.sentiment_analysis import run_classification, calc_final_sentiment
-from datetime import datetime
+from classification.sentiment_analysis import run_classification, classify_tweets, warm_up_classifiers, get_classification_cache_stats
+from classification.sentiment_aggregator import SentimentAggregator, sentiment_item
+from pipeline.streaming_pipeline import run_streaming_pipeline
+from pipeline.daemon import PipelineDaemon
+from utils.instrumentation import Instrumentation
+
+
+def report_bulk_upsert(collection: str, result: BulkUpsertResult):
+    print(f"Upserted into `{collection}`: {result.upserted} new, {result.modified} modified, {result.batches} batches")
+    for error in result.errors:
+        print(f"Bulk upsert into `{collection}` failed for batch {error.batch_index}: {error.message}")
 
 
 #  TODO: encapsulate in some class, and move to other file 
@@ -13,22 +25,24 @@ def add_classifications_into_db(processed_data):
     classifications = {}
     
     if 'tweets' in processed_data and processed_data['tweets']:
-        tweet_contents = [tweet['content'] for tweet in processed_data['tweets']]
-        tweet_sentiment_classification = run_classification(tweet_contents, type="tweet")
+        with Instrumentation.stage("pipeline.classify", items=len(processed_data['tweets'])):
+            tweet_sentiment_classification = classify_tweets(processed_data['tweets'])
 
-        for tweet, sentiment in zip(processed_data['tweets'], tweet_sentiment_classification):
-            tweet['sentiment'] = sentiment['label']
-            mongo_connector.MongoDatabase.upsert("tweets", {'id': tweet['tweet_id']}, tweet)
+        tweet_upserts = [({'id': tweet['tweet_id']}, tweet) for tweet in processed_data['tweets']]
+        report_bulk_upsert("tweets", mongo_connector.MongoDatabase.bulk_upsert("tweets", tweet_upserts))
         
         classifications['tweets'] = tweet_sentiment_classification
 
     if 'articles' in processed_data and processed_data['articles']:
         article_contents = [article['content'] for article in processed_data['articles']]
-        article_sentiment_classification = run_classification(article_contents, type="article")
+        with Instrumentation.stage("pipeline.classify_articles", items=len(article_contents)):
+            article_sentiment_classification = run_classification(article_contents, type="article")
         
         for article, sentiment in zip(processed_data['articles'], article_sentiment_classification):
             article['sentiment'] = sentiment['label']
-            mongo_connector.MongoDatabase.upsert("articles", {'id': article['id']}, article)
+
+        article_upserts = [({'id': article['id']}, article) for article in processed_data['articles']]
+        report_bulk_upsert("articles", mongo_connector.MongoDatabase.bulk_upsert("articles", article_upserts))
 
         classifications['articles'] = article_sentiment_classification
 
@@ -36,49 +50,91 @@ def add_classifications_into_db(processed_data):
 
 
 
-async def main():
+async def main(streaming: bool = False):
     mongodb_con = mongo_connector.MongoDatabase()
     mongodb_con.initialize()
+    mongodb_con.ensure_indexes()
+    print("======== MONGODB HEALTH CHECK ========")
+    print(mongodb_con.health_check())
+
+    load_times = warm_up_classifiers(["tweet"])
+    print("======== MODEL LOAD TIMES ========")
+    print(load_times)
 
     tt_scraper_info = twitter_info_config.TwitterInfoConfig()
-    scraping_accounts = tt_scraper_info.get_all_scraping_acc_data()
-    followed_tt_accounts = tt_scraper_info.get_all_followed_accounts()
+    scraping_accounts, followed_tt_accounts = await asyncio.gather(
+        asyncio.to_thread(tt_scraper_info.get_all_scraping_acc_data),
+        asyncio.to_thread(tt_scraper_info.get_all_followed_accounts)
+    )
     followed_accs_ids = tt_scraper_info.get_followed_accounts_ids(followed_tt_accounts)
 
 
-    print("======== SCRAPING ACCOUNTS ========")
-    print(scraping_accounts)
-    print("======== FOLLOWED TWITTER ACCOUNTS ========")
-    print(followed_tt_accounts)
+    print(f"Scraping accounts: {len(scraping_accounts)}, followed Twitter accounts: {len(followed_tt_accounts)}")
+
+    tweets_aggregator = SentimentAggregator(source="tweets")
 
     tt_scraper = tt_api.TwitterScraper(scraping_accounts)
     await tt_scraper.initialize()
-    await tt_scraper.get_todays_tweets_from_accounts_bulk(followed_accs_ids)
+    scrape_stats = await tt_scraper.get_todays_tweets_from_accounts_bulk(followed_accs_ids)
+    print("======== SCRAPING STATS ========")
+    print(f"Scraped {sum(stats.tweets for stats in scrape_stats)} new tweets from {len(scrape_stats)} accounts")
+    for stats in scrape_stats:
+        if stats.error:
+            print(f"Scraping account {stats.user_id} failed after {stats.attempts} attempts: {stats.error}")
     
-    processed_data = return_proceessed_tweets_and_articles()
-    print("========PROCESSED DATA========")
-    print(processed_data)
-
-    classifications = add_classifications_into_db(processed_data=processed_data)
-    print("========CLASSIFICATIONS========")
-    print(classifications)
-
-    final_sent, positive_sum, neutral_sum, negative_sum = calc_final_sentiment(classifications['tweets'])
-    print("FINAL SENTIMENT:", final_sent)
-
-    current_datetime = datetime.now()
-    date = current_datetime.date()
-
-    daily_sent_obj = DailySentimentObj(
-        day=date, 
-        positive_tweets=positive_sum,
-        neutral_tweets=neutral_sum, 
-        negative_tweets=negative_sum, 
-        sentiment_score=final_sent
-    )
+    if streaming:
+        summary = run_streaming_pipeline()
+        print("========STREAMING PIPELINE========")
+        print(summary)
+    else:
+        processed_data = return_proceessed_tweets_and_articles()
+        print("========PROCESSED DATA========")
+        print({kind: len(documents) for kind, documents in processed_data.items()})
+
+        classifications = add_classifications_into_db(processed_data=processed_data)
+        print("========CLASSIFICATIONS========")
+        print({kind: len(kind_classifications) for kind, kind_classifications in classifications.items()})
+
+        if processed_data.get('tweets'):
+            representative_tweets = [tweet for tweet in processed_data['tweets'] if 'duplicate_of' not in tweet]
+            tweets_aggregator.apply([sentiment_item(tweet) for tweet in representative_tweets])
+
+    print("========CLASSIFICATION CACHE========")
+    print(get_classification_cache_stats())
+
+    daily_sent_obj = tweets_aggregator.get_daily_sentiment()
+    print("FINAL SENTIMENT:", daily_sent_obj.sentiment_score)
+
+    print("========MONGODB POOL METRICS========")
+    print(mongodb_con.pool_metrics())
 
-    mongodb_con.insert_one("daily_sentiment", daily_sent_obj.__dict__)
+    print("========PIPELINE STAGES========")
+    for stage, stats in Instrumentation.snapshot().items():
+        print(f"{stage}: {stats}")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape, classify and aggregate today's crypto sentiment.")
+    parser.add_argument("--streaming", action="store_true", help="Process scraped tweets as a bounded-memory stream instead of loading the whole day.")
+    parser.add_argument("--serve", action="store_true", help="Run as a long-running service with warm models and connections.")
+    parser.add_argument("--interval", type=float, default=900, help="Seconds between two scrapes in service mode.")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="Process scraped data created since this ISO date in service mode, defaults to the start of today.")
+    parser.add_argument("--poll-interval", type=float, default=60, help="Seconds between two checks for unprocessed scraped data in service mode.")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve stage metrics in the Prometheus text format on http://0.0.0.0:<port>/metrics.")
+    parser.add_argument("--trace-malloc", action="store_true", help="Trace memory allocations (slows down every allocation) and report the peak usage.")
+    args = parser.parse_args()
+
+    if args.trace_malloc:
+        tracemalloc.start()
+
+    if args.metrics_port is not None:
+        Instrumentation.start_http_server(args.metrics_port)
+
+    if args.serve:
+        asyncio.run(PipelineDaemon(interval_seconds=args.interval, poll_seconds=args.poll_interval, process_since=args.since).serve())
+    else:
+        asyncio.run(main(streaming=args.streaming))
+
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"Traced memory: {current / 2**20:.1f} MiB current, {peak / 2**20:.1f} MiB peak")
\ No newline at end of file
@@ -0,0 +1,88 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Tuple
+from mongodb.mongo_connector import MongoDatabase
+from mongodb.mongo_models import BulkUpsertResult
+
+
+class AsyncMongoDatabase(object):
+    """
+    Asyncio counterpart of `MongoDatabase` with the same methods.
+
+    Every call is offloaded to a small thread pool and runs on the shared pooled client of
+    `MongoDatabase`, so coroutines (e.g. scrapers) keep running while database I/O is in flight.
+    Unlike `MongoDatabase.find`, `find` returns the matching documents as a list, because the
+    cursor itself would do blocking I/O while being iterated.
+    """
+    MAX_WORKERS = int(os.environ.get("MONGODB_ASYNC_WORKERS", 8))
+
+    EXECUTOR = None
+
+
+    @staticmethod
+    async def _run(function, *args, **kwargs):
+        if AsyncMongoDatabase.EXECUTOR is None:
+            AsyncMongoDatabase.EXECUTOR = ThreadPoolExecutor(max_workers=AsyncMongoDatabase.MAX_WORKERS, thread_name_prefix="mongodb")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(AsyncMongoDatabase.EXECUTOR, partial(function, *args, **kwargs))
+
+    @staticmethod
+    async def initialize():
+        await AsyncMongoDatabase._run(MongoDatabase.initialize)
+
+    @staticmethod
+    async def get_database():
+        return await AsyncMongoDatabase._run(MongoDatabase.get_database)
+
+    @staticmethod
+    async def ensure_indexes():
+        await AsyncMongoDatabase._run(MongoDatabase.ensure_indexes)
+
+    @staticmethod
+    async def health_check() -> dict:
+        return await AsyncMongoDatabase._run(MongoDatabase.health_check)
+
+    @staticmethod
+    async def pool_metrics() -> dict:
+        return await AsyncMongoDatabase._run(MongoDatabase.pool_metrics)
+
+    @staticmethod
+    async def insert_one(collection: str, data: dict):
+        await AsyncMongoDatabase._run(MongoDatabase.insert_one, collection, data)
+
+    @staticmethod
+    async def insert_many(collection: str, data: list[dict]):
+        await AsyncMongoDatabase._run(MongoDatabase.insert_many, collection, data)
+
+    @staticmethod
+    async def find(collection: str, query: dict) -> List[dict]:
+        return await AsyncMongoDatabase._run(lambda: list(MongoDatabase.find(collection, query)))
+
+    @staticmethod
+    async def find_one(collection: str, query: dict):
+        return await AsyncMongoDatabase._run(MongoDatabase.find_one, collection, query)
+
+    @staticmethod
+    async def upsert(collection: str, query: dict, document: dict):
+        return await AsyncMongoDatabase._run(MongoDatabase.upsert, collection, query, document)
+
+    @staticmethod
+    async def update_many(collection: str, query: dict, update: dict):
+        return await AsyncMongoDatabase._run(MongoDatabase.update_many, collection, query, update)
+
+    @staticmethod
+    async def bulk_increment(collection: str, operations: List[Tuple[dict, dict]], batch_size: int = 1000) -> BulkUpsertResult:
+        return await AsyncMongoDatabase._run(MongoDatabase.bulk_increment, collection, operations, batch_size)
+
+    @staticmethod
+    async def bulk_upsert(collection: str, operations: List[Tuple[dict, dict]], batch_size: int = 1000) -> BulkUpsertResult:
+        return await AsyncMongoDatabase._run(MongoDatabase.bulk_upsert, collection, operations, batch_size)
+
+    @staticmethod
+    async def close():
+        await AsyncMongoDatabase._run(MongoDatabase.close)
+        if AsyncMongoDatabase.EXECUTOR is not None:
+            AsyncMongoDatabase.EXECUTOR.shutdown(wait=True)
+            AsyncMongoDatabase.EXECUTOR = None
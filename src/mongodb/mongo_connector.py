@@ -1,6 +1,11 @@
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ConfigurationError
-from typing import List
+from pymongo import MongoClient, UpdateOne, IndexModel, ASCENDING
+from pymongo.errors import ConnectionFailure, ConfigurationError, BulkWriteError, PyMongoError
+from typing import List, Tuple
+from mongodb.mongo_models import BulkUpsertResult, BulkWriteBatchError
+from mongodb.pool_metrics import PoolMetricsListener
+from utils.instrumentation import Instrumentation
+import threading
+import time
 import os 
 
 class MongoDatabase(object):
@@ -8,66 +13,254 @@ class MongoDatabase(object):
     MONGODB_PORT = int(os.environ.get("MONGODB_PORT", 27017))
     MONGODB_USER = os.environ.get("MONGODB_USER")
     MONGODB_PASSWORD = os.environ.get("MONGODB_PASSWORD")
-    DB_NAME = 'crypto_sentiment' or os.environ.get("MONGODB_DB")
+    DB_NAME = os.environ.get("MONGODB_DB", 'crypto_sentiment')
+
+    MAX_POOL_SIZE = int(os.environ.get("MONGODB_MAX_POOL_SIZE", 50))
+    MIN_POOL_SIZE = int(os.environ.get("MONGODB_MIN_POOL_SIZE", 1))
+    MAX_IDLE_TIME_MS = int(os.environ.get("MONGODB_MAX_IDLE_TIME_MS", 300000))
+    CONNECT_TIMEOUT_MS = int(os.environ.get("MONGODB_CONNECT_TIMEOUT_MS", 5000))
+    SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    SOCKET_TIMEOUT_MS = int(os.environ.get("MONGODB_SOCKET_TIMEOUT_MS", 30000))
+
+    # indexes backing the hot queries, see mongodb/query_plan_check.py
+    INDEXES = {
+        "scraped_data": [
+            IndexModel([("type", ASCENDING), ("created", ASCENDING)], name="type_created"),
+            IndexModel([("type", ASCENDING), ("tweet_id", ASCENDING)], name="type_tweet_id"),
+            IndexModel([("type", ASCENDING), ("processed", ASCENDING), ("created", ASCENDING)], name="type_processed_created"),
+        ],
+        "tweets": [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True, sparse=True),
+        ],
+        "articles": [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True, sparse=True),
+        ],
+        "daily_sentiment": [
+            IndexModel([("day", ASCENDING)], name="day", unique=True),
+        ],
+        "sentiment_rollups": [
+            IndexModel(
+                [("source", ASCENDING), ("granularity", ASCENDING), ("dimension", ASCENDING), ("key", ASCENDING), ("bucket", ASCENDING)], 
+                name="rollup_bucket_unique", 
+                unique=True
+            ),
+        ],
+        "ticker_index": [
+            IndexModel([("tag", ASCENDING), ("kind", ASCENDING), ("tweet_id", ASCENDING)], name="tag_tweet_unique", unique=True),
+            IndexModel([("tag", ASCENDING), ("kind", ASCENDING), ("created", ASCENDING)], name="tag_created"),
+        ],
+        "tt_scrape_state": [
+            IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+        ],
+    }
 
     CLIENT = None
     DATABASE = None
+    POOL_METRICS = PoolMetricsListener()
+
+    _LOCK = threading.Lock()
 
 
     @staticmethod
     def initialize():
-        try:
-            if MongoDatabase.MONGODB_USER and MongoDatabase.MONGODB_PASSWORD:
-                connection_string = f"mongodb://{MongoDatabase.MONGODB_USER}:{MongoDatabase.MONGODB_PASSWORD}@{MongoDatabase.MONGODB_HOST}:{MongoDatabase.MONGODB_PORT}/{MongoDatabase.DB_NAME}"
-            else:
-                connection_string = f"mongodb://{MongoDatabase.MONGODB_HOST}:{MongoDatabase.MONGODB_PORT}/"
+        """ Creates the process-wide client and its connection pool. Calling it again is a no-op. """
+        if MongoDatabase.CLIENT is not None:
+            return
+
+        with MongoDatabase._LOCK:
+            if MongoDatabase.CLIENT is not None:
+                return
+
+            try:
+                if MongoDatabase.MONGODB_USER and MongoDatabase.MONGODB_PASSWORD:
+                    connection_string = f"mongodb://{MongoDatabase.MONGODB_USER}:{MongoDatabase.MONGODB_PASSWORD}@{MongoDatabase.MONGODB_HOST}:{MongoDatabase.MONGODB_PORT}/{MongoDatabase.DB_NAME}"
+                else:
+                    connection_string = f"mongodb://{MongoDatabase.MONGODB_HOST}:{MongoDatabase.MONGODB_PORT}/"
+
+                client = MongoClient(
+                    connection_string,
+                    maxPoolSize=MongoDatabase.MAX_POOL_SIZE,
+                    minPoolSize=MongoDatabase.MIN_POOL_SIZE,
+                    maxIdleTimeMS=MongoDatabase.MAX_IDLE_TIME_MS,
+                    connectTimeoutMS=MongoDatabase.CONNECT_TIMEOUT_MS,
+                    serverSelectionTimeoutMS=MongoDatabase.SERVER_SELECTION_TIMEOUT_MS,
+                    socketTimeoutMS=MongoDatabase.SOCKET_TIMEOUT_MS,
+                    event_listeners=[MongoDatabase.POOL_METRICS]
+                )
+                MongoDatabase.DATABASE = client[MongoDatabase.DB_NAME]
+                MongoDatabase.CLIENT = client
+
+            except ConnectionFailure as e:
+                print(f"Error connecting to MongoDB: {e}")
+                # Log the error
 
-            MongoDatabase.CLIENT = MongoClient(connection_string)
-            MongoDatabase.DATABASE = MongoDatabase.CLIENT[MongoDatabase.DB_NAME]
+            except ConfigurationError as e:
+                print(f"MongoDB configuration error: {e}")
+                # log error
 
-        except ConnectionFailure as e:
-            print(f"Error connecting to MongoDB: {e}")
-            # Log the error
+    @staticmethod
+    def get_database():
+        """ Returns the database handle, connecting lazily on first use. """
+        if MongoDatabase.DATABASE is None:
+            MongoDatabase.initialize()
+        return MongoDatabase.DATABASE
+
+    @staticmethod
+    def ensure_indexes():
+        """
+        Creates the indexes declared in `INDEXES`. Existing indexes are left untouched, except indexes
+        whose uniqueness changed since they were created (e.g. `daily_sentiment.day`), which are rebuilt.
+        When the rebuild fails (e.g. a unique index over duplicate values), the old index is restored.
+        """
+        database = MongoDatabase.get_database()
+        for collection, indexes in MongoDatabase.INDEXES.items():
+            dropped = []
+            try:
+                existing = database[collection].index_information()
+                for index in indexes:
+                    name = index.document['name']
+                    # createIndexes fails with IndexOptionsConflict when only the options of an index differ,
+                    # and an index with the same key but other options cannot exist next to it, so it is dropped first
+                    if name in existing and existing[name].get('unique', False) != index.document.get('unique', False):
+                        database[collection].drop_index(name)
+                        dropped.append(IndexModel(
+                            existing[name]['key'], 
+                            name=name, 
+                            unique=existing[name].get('unique', False), 
+                            sparse=existing[name].get('sparse', False)
+                        ))
+                database[collection].create_indexes(indexes)
+            except PyMongoError as e:
+                print(f"Error with creating indexes of `{collection}` in MongoDB: {e}")
+                if dropped:
+                    try:
+                        database[collection].create_indexes(dropped)
+                        print(f"Restored the previous indexes {[index.document['name'] for index in dropped]} of `{collection}`")
+                    except PyMongoError as restore_error:
+                        print(f"Error with restoring indexes of `{collection}` in MongoDB: {restore_error}")
+
+    @staticmethod
+    def health_check() -> dict:
+        """ Pings the server and returns the round-trip latency. """
+        start = time.perf_counter()
+        try:
+            MongoDatabase.get_database().client.admin.command("ping")
+            return {"ok": True, "latency_ms": round(1000 * (time.perf_counter() - start), 3)}
+        except Exception as e:
+            return {"ok": False, "latency_ms": round(1000 * (time.perf_counter() - start), 3), "error": str(e)}
 
-        except ConfigurationError as e:
-            print(f"MongoDB configuration error: {e}")
-            # log error
+    @staticmethod
+    def pool_metrics() -> dict:
+        """ Returns connection and pool metrics of the shared client. """
+        metrics = MongoDatabase.POOL_METRICS.snapshot()
+        metrics["max_pool_size"] = MongoDatabase.MAX_POOL_SIZE
+        metrics["connected"] = MongoDatabase.CLIENT is not None
+        return metrics
 
 
     @staticmethod
     def insert_one(collection: str, data: dict):
         try:
-            MongoDatabase.DATABASE[collection].insert_one(data)
+            MongoDatabase.get_database()[collection].insert_one(data)
         except Exception as e:
             print(f"Error with inserting data into MongoDB: {e}")
 
     @staticmethod
     def insert_many(collection: str, data: list[dict]):
         try:
-            MongoDatabase.DATABASE[collection].insert_many(data)
+            with Instrumentation.stage("mongodb.insert_many", items=len(data)):
+                MongoDatabase.get_database()[collection].insert_many(data)
         except Exception as e:
             print(f"Error with inserting data into MongoDB: {e}")
 
     @staticmethod
     def find(collection: str, query: dict):
-        return MongoDatabase.DATABASE[collection].find(query)
+        return MongoDatabase.get_database()[collection].find(query)
 
     @staticmethod
     def find_one(collection: str, query: dict):
-        return MongoDatabase.DATABASE[collection].find_one(query)
+        return MongoDatabase.get_database()[collection].find_one(query)
 
     @staticmethod
     def upsert(collection: str, query: dict, document: dict):
         try:
-            if '_id' in document:
-                del document['_id']
+            document = {key: value for key, value in document.items() if key != '_id'}
             update_data = {"$set": document}
-            result = MongoDatabase.DATABASE[collection].update_one(query, update_data, upsert=True)
+            result = MongoDatabase.get_database()[collection].update_one(query, update_data, upsert=True)
             return result
         except Exception as e:
             print(f"Error with upserting data into MongoDB: {e}")
 
+    @staticmethod
+    def update_many(collection: str, query: dict, update: dict):
+        try:
+            return MongoDatabase.get_database()[collection].update_many(query, update)
+        except Exception as e:
+            print(f"Error with updating data in MongoDB: {e}")
+
+    @staticmethod
+    def bulk_increment(collection: str, operations: List[Tuple[dict, dict]], batch_size: int = 1000) -> BulkUpsertResult:
+        """ Applies many `$inc` upserts, given as pairs of (query, increments), with unordered `bulk_write` calls. """
+        return MongoDatabase._bulk_write(
+            collection, 
+            [UpdateOne(query, {"$inc": increments}, upsert=True) for query, increments in operations], 
+            batch_size
+        )
+
+    @staticmethod
+    def bulk_upsert(collection: str, operations: List[Tuple[dict, dict]], batch_size: int = 1000) -> BulkUpsertResult:
+        """
+        Upserts many documents with unordered `bulk_write` calls of at most `batch_size` operations.
+
+        Args:
+            collection (str): Name of the collection.
+            operations (List[Tuple[dict, dict]]): Pairs of (query, document), every document is `$set` on the document matching its query.
+            batch_size (int): Maximum number of operations sent in one round-trip.
+
+        Returns:
+            BulkUpsertResult: Counts of matched, modified and upserted documents and errors of every failed batch.
+            Documents passed by the caller are not modified.
+        """
+        requests = [
+            UpdateOne(query, {"$set": {key: value for key, value in document.items() if key != '_id'}}, upsert=True)
+            for query, document in operations
+        ]
+        return MongoDatabase._bulk_write(collection, requests, batch_size)
+
+    @staticmethod
+    def _bulk_write(collection: str, requests: List[UpdateOne], batch_size: int) -> BulkUpsertResult:
+        if batch_size < 1:
+            raise ValueError("Value for argument 'batch_size' must be at least 1.")
+
+        result = BulkUpsertResult()
+        for batch_index, start in enumerate(range(0, len(requests), batch_size)):
+            result.batches += 1
+            batch = requests[start:start + batch_size]
+
+            try:
+                with Instrumentation.stage("mongodb.bulk_write", items=len(batch)):
+                    batch_result = MongoDatabase.get_database()[collection].bulk_write(batch, ordered=False)
+                result.matched += batch_result.matched_count
+                result.modified += batch_result.modified_count
+                result.upserted += batch_result.upserted_count
+            except BulkWriteError as e:
+                # unordered writes still apply every operation that did not fail
+                details = e.details
+                result.matched += details.get('nMatched', 0)
+                result.modified += details.get('nModified', 0)
+                result.upserted += details.get('nUpserted', 0)
+                result.errors.append(BulkWriteBatchError(batch_index, str(e), details.get('writeErrors', [])))
+                result.failed_operations.extend(start + error['index'] for error in details.get('writeErrors', []))
+            except PyMongoError as e:
+                result.errors.append(BulkWriteBatchError(batch_index, str(e)))
+                result.failed_operations.extend(range(start, start + len(batch)))
+
+        return result
+
     @staticmethod
     def close():
-        if MongoDatabase.CLIENT:
-            MongoDatabase.CLIENT.close()
\ No newline at end of file
+        with MongoDatabase._LOCK:
+            if MongoDatabase.CLIENT:
+                MongoDatabase.CLIENT.close()
+            MongoDatabase.CLIENT = None
+            MongoDatabase.DATABASE = None
\ No newline at end of file
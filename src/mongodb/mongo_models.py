@@ -1,5 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import List
 
 @dataclass
 class TwitterAccount():
@@ -25,3 +26,26 @@ class DailySentimentObj:
     negative_tweets: int
     sentiment_score: float
 
+
+@dataclass
+class BulkWriteBatchError:
+    """Class representing errors of a single failed batch of a bulk write."""
+    batch_index: int
+    message: str
+    write_errors: List[dict] = field(default_factory=list)
+
+
+@dataclass
+class BulkUpsertResult:
+    """Class representing summary of a bulk upsert."""
+    matched: int = 0
+    modified: int = 0
+    upserted: int = 0
+    batches: int = 0
+    errors: List[BulkWriteBatchError] = field(default_factory=list)
+    # indices (in the order passed by the caller) of operations that were not applied
+    failed_operations: List[int] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
@@ -0,0 +1,63 @@
+import sys
+from datetime import datetime, timedelta
+from typing import List
+from mongodb.mongo_connector import MongoDatabase
+
+
+# (collection, filter) pairs of the queries run by the pipeline on every run
+HOT_QUERIES = [
+    ("scraped_data", {"type": "tweet", "created": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 1, 1) + timedelta(days=1)}}),
+    ("scraped_data", {"type": "article", "created": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 1, 1) + timedelta(days=1)}}),
+    ("scraped_data", {"type": "tweet", "tweet_id": {"$in": [0]}}),
+    ("scraped_data", {"type": "tweet", "processed": {"$exists": False}, "created": {"$gte": datetime(2024, 1, 1)}}),
+    ("tweets", {"id": 0}),
+    ("articles", {"id": 0}),
+    ("daily_sentiment", {"day": datetime(2024, 1, 1)}),
+    ("tt_scrape_state", {"user_id": 0}),
+    ("ticker_index", {"tag": "BTC", "kind": "cashtag", "created": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 1, 2)}}),
+    ("sentiment_rollups", {"source": "tweets", "granularity": "hour", "dimension": "all", "key": "*", "bucket": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 1, 2)}}),
+]
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    """ Returns names of all stages of an explain() plan tree. """
+    stages = [plan['stage']] if 'stage' in plan else []
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get('inputStages', []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def check_query_plans() -> List[dict]:
+    """
+    Runs explain() on every hot query.
+
+    Returns:
+        List[dict]: Collection, filter, plan stages and a `collection_scan` flag of every hot query.
+    """
+    database = MongoDatabase.get_database()
+    results = []
+    for collection, query in HOT_QUERIES:
+        explanation = database[collection].find(query).explain()
+        stages = _plan_stages(explanation['queryPlanner']['winningPlan'])
+        results.append({
+            "collection": collection,
+            "query": query,
+            "stages": stages,
+            "collection_scan": 'COLLSCAN' in stages
+        })
+    return results
+
+
+if __name__ == "__main__":
+    # usage (from src/): python -m mongodb.query_plan_check
+    MongoDatabase.ensure_indexes()
+    failed = False
+    for result in check_query_plans():
+        status = "COLLSCAN" if result['collection_scan'] else "ok"
+        print(f"[{status}] {result['collection']} {result['query']} -> {' > '.join(result['stages'])}")
+        failed = failed or result['collection_scan']
+    MongoDatabase.close()
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import List, Union
+from mongodb.async_mongo_connector import AsyncMongoDatabase
+
+
+class ScrapeStateStore:
+    def __init__(self, collection_name: str = 'tt_scrape_state'):
+        """
+        A class storing per-account high-water marks of the Twitter scraper.
+
+        For every followed account the newest scraped tweet id and its creation time are kept,
+        so the next run fetches only tweets newer than the mark.
+
+        Attributes:
+            collection_name (str): String name for the MongoDB collection containing the marks.
+        """
+        self.collection_name = collection_name
+        self.connector = AsyncMongoDatabase()
+
+    async def get_high_water_mark(self, user_id: int) -> Union[dict, None]:
+        """ Returns `{"last_tweet_id", "last_created"}` of the account, or None if it was never scraped. """
+        return await self.connector.find_one(self.collection_name, {"user_id": user_id})
+
+    async def update_high_water_mark(self, user_id: int, tweets: List[dict]):
+        """ Moves the account's mark to the newest of the given (already saved) tweets. """
+        if not tweets:
+            return
+        newest_tweet = max(tweets, key=lambda tweet: tweet['tweet_id'])
+        current_mark = await self.get_high_water_mark(user_id)
+        if current_mark and current_mark['last_tweet_id'] >= newest_tweet['tweet_id']:
+            return
+
+        mark = {
+            "user_id": user_id,
+            "last_tweet_id": newest_tweet['tweet_id'],
+            "last_created": newest_tweet['created'],
+            "updated": datetime.now()
+        }
+        await self.connector.upsert(self.collection_name, {"user_id": user_id}, mark)
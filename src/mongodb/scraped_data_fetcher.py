@@ -1,7 +1,7 @@
 from mongodb.mongo_connector import MongoDatabase
 from datetime import datetime
 from utils.date_utils import get_start_and_end_of_day
-from typing import List, Union
+from typing import Iterator, List, Union
 import os 
 
 
@@ -26,7 +26,6 @@ class ScrapedDataFetcher:
                 "$lt": created_to
             }
         }
-        self.connector.initialize()
         cursor = self.connector.find(self.collection_name, query)
         tweets = []
         for tweet in cursor:
@@ -42,12 +41,48 @@ class ScrapedDataFetcher:
                 "$lt": created_to
             }
         }
-        self.connector.initialize()
         cursor  = self.connector.find(self.collection_name, query)
         articles = []
         for article in cursor:
             articles.append(article)
         return articles
+
+
+    def iter_scraped(self, type: str, created_from: datetime, created_to: datetime, batch_size: int = 1000) -> Iterator[dict]:
+        """ Streams scraped documents of the given type from the cursor, `batch_size` documents per round-trip. """
+        query = {
+            "type": type,
+            "created": {
+                "$gte": created_from,
+                "$lt": created_to
+            }
+        }
+        return self._iter_query(query, batch_size)
+
+
+    def iter_unprocessed(self, type: str, created_from: datetime, batch_size: int = 1000) -> Iterator[dict]:
+        """ Streams scraped documents of the given type created since `created_from` which were not marked as processed yet. """
+        query = {
+            "type": type,
+            "processed": {"$exists": False},
+            "created": {"$gte": created_from}
+        }
+        return self._iter_query(query, batch_size)
+
+
+    def _iter_query(self, query: dict, batch_size: int) -> Iterator[dict]:
+        cursor = self.connector.find(self.collection_name, query).batch_size(batch_size)
+        try:
+            for document in cursor:
+                yield document
+        finally:
+            cursor.close()
+
+
+    def mark_processed(self, ids: List) -> None:
+        """ Marks scraped documents with the given `_id`s as processed, so they are skipped by `iter_unprocessed`. """
+        if ids:
+            self.connector.update_many(self.collection_name, {"_id": {"$in": ids}}, {"$set": {"processed": datetime.now()}})
     
 
 def get_todays_scraped_data(collection_name: str =  "scraped_data", articles: bool = True, tweets: bool = True):
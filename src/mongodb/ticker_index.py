@@ -0,0 +1,45 @@
+from datetime import datetime
+from typing import List, Union
+from mongodb.mongo_connector import MongoDatabase
+from mongodb.mongo_models import BulkUpsertResult
+
+
+class TickerIndex:
+    def __init__(self, collection_name: str = 'ticker_index'):
+        """
+        Inverted index of cashtags and hashtags to the tweets mentioning them.
+
+        Every (tag, tweet) pair is one document, e.g. `{"tag": "BTC", "kind": "cashtag", "tweet_id": ..., "created": ...}`.
+        Cashtags are stored uppercase, hashtags lowercase.
+
+        Attributes:
+            collection_name (str): String name for the MongoDB collection containing the index.
+        """
+        self.collection_name = collection_name
+        self.connector = MongoDatabase()
+
+    def add(self, tweets: List[dict]) -> Union[BulkUpsertResult, None]:
+        """ Indexes `cashtags` and `hashtags` of processed tweets. Indexing the same tweet again is a no-op. """
+        operations = []
+        for tweet in tweets:
+            for kind, tags in (("cashtag", tweet.get('cashtags', [])), ("hashtag", tweet.get('hashtags', []))):
+                for tag in tags:
+                    query = {"tag": tag, "kind": kind, "tweet_id": tweet['tweet_id']}
+                    operations.append((query, {**query, "created": tweet.get('created')}))
+
+        if not operations:
+            return None
+        return self.connector.bulk_upsert(self.collection_name, operations)
+
+    def get_tweet_ids(self, tag: str, created_from: datetime, created_to: datetime, kind: str = "cashtag") -> List[int]:
+        """ Returns ids of tweets created in the given range which mention the tag. """
+        tag = tag.upper() if kind == "cashtag" else tag.lower()
+        query = {
+            "tag": tag,
+            "kind": kind,
+            "created": {
+                "$gte": created_from,
+                "$lt": created_to
+            }
+        }
+        return [entry['tweet_id'] for entry in self.connector.find(self.collection_name, query)]
@@ -10,7 +10,6 @@ class TwitterInfoConfig:
         self.followed_collection_name = followed_collection_name
 
     def get_all_scraping_acc_data(self) -> List[TwitterAccount]:
-        self.connector.initialize()
         cursor = self.connector.find(self.scraping_acc_collection_name, {})
         twitter_accounts = []
         for acc in cursor:
@@ -24,7 +23,6 @@ class TwitterInfoConfig:
         return twitter_accounts
 
     def get_all_followed_accounts(self) -> List[TwitterScrapedAccount]:
-        self.connector.initialize()
         cursor = self.connector.find(self.followed_collection_name, {})
         scraped_accounts = []
         for acc in cursor:
@@ -0,0 +1,137 @@
+import asyncio
+import signal
+import time
+from datetime import datetime
+from typing import Dict, Union
+import data_scraping.twitter_api as tt_api
+from classification.sentiment_analysis import run_classification, warm_up_classifiers
+from data_processing.process_scraped_data import process_articles
+from mongodb.async_mongo_connector import AsyncMongoDatabase
+from mongodb.mongo_connector import MongoDatabase
+from mongodb.scraped_data_fetcher import ScrapedDataFetcher
+from mongodb.twitter_info_config import TwitterInfoConfig
+from pipeline.streaming_pipeline import run_streaming_pipeline
+from utils.date_utils import get_start_and_end_of_day
+
+
+class PipelineDaemon:
+    def __init__(self, interval_seconds: float = 900, poll_seconds: float = 60, batch_size: int = 256, process_since: Union[datetime, None] = None):
+        """
+        Long-running service running scrape/process/classify cycles in one process.
+
+        The MongoDB connection pool, the scraping account sessions and the models are set up once in `start`
+        and stay warm between cycles. Followed accounts are scraped every `interval_seconds`, and scraped data
+        not marked as processed yet is processed every `poll_seconds`, so data inserted by other scrapers is
+        picked up without waiting for the next scrape. Only data created since `process_since` is considered,
+        so documents handled by one-shot runs before the daemon existed (never marked as processed) are not
+        reprocessed. SIGINT/SIGTERM let the running cycle finish and close the connections.
+
+        Attributes:
+            interval_seconds (float): Time between two scrapes of the followed accounts.
+            poll_seconds (float): Time between two checks for unprocessed scraped data.
+            batch_size (int): Number of scraped tweets processed, classified and written together.
+            process_since (datetime): Oldest creation time of processed scraped data. Defaults to the start of today.
+        """
+        if poll_seconds <= 0 or interval_seconds <= 0:
+            raise ValueError("Values for arguments 'interval_seconds' and 'poll_seconds' must be positive.")
+
+        self.interval_seconds = interval_seconds
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self.process_since = process_since or get_start_and_end_of_day("Etc/GMT-2")[0]
+        self.twitter_info = TwitterInfoConfig()
+        self.fetcher = ScrapedDataFetcher()
+        self.scraper = None
+        self.cycles = 0
+        self._stopping = None
+
+    async def start(self):
+        """ Connects to MongoDB, loads the models and prepares the scraping account sessions. """
+        await AsyncMongoDatabase.initialize()
+        await AsyncMongoDatabase.ensure_indexes()
+        print(await AsyncMongoDatabase.health_check())
+
+        load_times = await asyncio.to_thread(warm_up_classifiers, ["tweet", "article"])
+        print(f"Models loaded: {load_times}")
+
+        scraping_accounts = await asyncio.to_thread(self.twitter_info.get_all_scraping_acc_data)
+        if not scraping_accounts:
+            raise Exception("No Twitter scraping accounts found in the MongoDB database.")
+        self.scraper = tt_api.TwitterScraper(scraping_accounts)
+        await self.scraper.initialize()
+
+    def stop(self):
+        """ Requests a graceful shutdown after the running cycle. """
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def scrape(self):
+        # followed accounts are re-read every cycle, so accounts added in the meantime are scraped too
+        followed_accounts = await asyncio.to_thread(self.twitter_info.get_all_followed_accounts)
+        scrape_stats = await self.scraper.get_todays_tweets_from_accounts_bulk(self.twitter_info.get_followed_accounts_ids(followed_accounts))
+        scraped = sum(stats.tweets for stats in scrape_stats)
+        failed = [stats for stats in scrape_stats if stats.error]
+        print(f"Scraped {scraped} new tweets from {len(scrape_stats)} accounts, {len(failed)} accounts failed")
+
+    def process_articles(self) -> int:
+        """ Processes, classifies and saves scraped articles not marked as processed yet. """
+        scraped_articles = list(self.fetcher.iter_unprocessed("article", self.process_since))
+        if not scraped_articles:
+            return 0
+
+        scraped_ids = [article['_id'] for article in scraped_articles]
+        articles = process_articles(scraped_articles)
+        if articles:
+            classifications = run_classification([article['content'] for article in articles], type="article")
+            for article, sentiment in zip(articles, classifications):
+                article['sentiment'] = sentiment['label']
+
+            result = MongoDatabase.bulk_upsert("articles", [({'id': article['id']}, article) for article in articles])
+            if not result.ok:
+                # the scraped articles stay unprocessed and are picked up again by the next cycle
+                print(f"Saving articles failed: {[error.message for error in result.errors]}")
+                return 0
+
+        self.fetcher.mark_processed(scraped_ids)
+        return len(articles)
+
+    def process(self) -> Dict:
+        """ Processes, classifies and saves all scraped data not marked as processed yet. """
+        summary = run_streaming_pipeline(created_from=self.process_since, batch_size=self.batch_size, only_unprocessed=True)
+        summary['articles'] = self.process_articles()
+        return summary
+
+    async def serve(self):
+        """ Runs cycles until SIGINT/SIGTERM, then closes the connections. """
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, self.stop)
+
+        try:
+            await self.start()
+            next_scrape = time.monotonic()
+            while not self._stopping.is_set():
+                try:
+                    if time.monotonic() >= next_scrape:
+                        next_scrape = time.monotonic() + self.interval_seconds
+                        await self.scrape()
+
+                    summary = await asyncio.to_thread(self.process)
+                    if summary['processed'] or summary['articles'] or summary['errors']:
+                        print(f"Cycle {self.cycles}: {summary}")
+                except Exception as e:
+                    # a failed cycle is retried by the next one, unprocessed data stays unprocessed
+                    print(f"Cycle {self.cycles} failed: {e}")
+                self.cycles += 1
+
+                try:
+                    wait_seconds = max(0.0, min(self.poll_seconds, next_scrape - time.monotonic()))
+                    await asyncio.wait_for(self._stopping.wait(), timeout=wait_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for signal_number in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(signal_number)
+            await AsyncMongoDatabase.close()
+            print(f"Pipeline daemon stopped after {self.cycles} cycles")
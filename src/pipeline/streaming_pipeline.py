@@ -0,0 +1,154 @@
+import queue
+import threading
+from datetime import datetime
+from typing import Dict, Union
+from classification.sentiment_analysis import classify_tweets
+from classification.sentiment_aggregator import SentimentAggregator, sentiment_item
+from data_processing.process_scraped_data import iter_processed_tweets, tweet_processor
+from mongodb.mongo_connector import MongoDatabase
+from mongodb.scraped_data_fetcher import ScrapedDataFetcher
+from mongodb.ticker_index import TickerIndex
+from utils.batching import batched
+from utils.date_utils import get_start_and_end_of_day
+from utils.instrumentation import Instrumentation
+
+
+class _BulkWriter(threading.Thread):
+    """Background thread writing classified batches back to MongoDB while the next batch is classified."""
+
+    def __init__(self, collection: str, queue_size: int, aggregator: SentimentAggregator, fetcher: ScrapedDataFetcher):
+        super().__init__(daemon=True)
+        self.collection = collection
+        self.aggregator = aggregator
+        self.fetcher = fetcher
+        self.ticker_index = TickerIndex()
+        # a bounded queue blocks the producer when writes fall behind, so at most
+        # `queue_size` classified batches are held in memory at any time
+        self.batches = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.errors = []
+        # exception which stopped the writer, re-raised in the producer
+        self.failure = None
+
+    def put(self, batch: Union[tuple, None]):
+        """ Queues a batch for write-back, raising the writer's exception instead of blocking if it stopped. """
+        while True:
+            if self.failure is not None:
+                raise self.failure
+            if not self.is_alive():
+                raise RuntimeError("Bulk writer stopped before all batches were written.")
+            try:
+                self.batches.put(batch, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def run(self):
+        try:
+            self._write_batches()
+        except Exception as e:
+            self.failure = e
+
+    def _write_batches(self):
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                return
+            tweets, scraped_ids = batch
+            if tweets:
+                operations = [({'id': tweet['tweet_id']}, tweet) for tweet in tweets]
+                result = MongoDatabase.bulk_upsert(self.collection, operations)
+                self.written += result.upserted + result.modified
+                self.errors.extend(result.errors)
+                if not result.ok:
+                    # the scraped documents stay unprocessed and are picked up again by the next run
+                    continue
+                self.ticker_index.add(tweets)
+                # near-duplicates are counted once, through the representative of their cluster
+                self.aggregator.apply([sentiment_item(tweet) for tweet in tweets if 'duplicate_of' not in tweet])
+            self.fetcher.mark_processed(scraped_ids)
+
+
+def run_streaming_pipeline(created_from: Union[datetime, None] = None, created_to: Union[datetime, None] = None, batch_size: int = 256, fetch_batch_size: int = 1000, write_queue_size: int = 2, collection_name: str = "tweets", only_unprocessed: bool = False) -> Dict:
+    """
+    Stream today's scraped tweets from the `scraped_data` cursor through cleaning, classification and write-back.
+
+    Documents are pulled from the cursor lazily, cleaned and validated one by one, classified in batches of
+    `batch_size` tweets and written back with bulk upserts by a background writer. Memory use depends only on
+    `batch_size`, `fetch_batch_size` and `write_queue_size`, not on the number of tweets scraped in a day.
+    Daily sentiment counters are incremented as every batch is written.
+    Near-duplicate detection is scoped to a single inference batch.
+    Every scraped tweet is marked as `processed` in `scraped_data` once its batch is written (invalid tweets included).
+
+    Args:
+        created_from (datetime): Start of the processed window. Defaults to the start of today.
+        created_to (datetime): End of the processed window. Defaults to the end of today.
+        batch_size (int): Number of scraped tweets processed, classified and written together.
+        fetch_batch_size (int): Number of documents fetched from MongoDB per round-trip.
+        write_queue_size (int): Maximum number of classified batches waiting for write-back.
+        collection_name (str): Collection the classified tweets are upserted into.
+        only_unprocessed (bool): Process every scraped tweet created since `created_from` which is not marked as processed yet,
+            `created_to` is ignored then.
+
+    Returns:
+        Dict: Counts of processed tweets per sentiment label in this run, number of written tweets and write errors.
+    """
+    start_of_today, end_of_today = get_start_and_end_of_day("Etc/GMT-2")
+    created_from = created_from or start_of_today
+    created_to = created_to or end_of_today
+
+    fetcher = ScrapedDataFetcher()
+    writer = _BulkWriter(collection_name, write_queue_size, SentimentAggregator(source="tweets"), fetcher)
+    writer.start()
+
+    counters = {"Bullish": 0, "Neutral": 0, "Bearish": 0}
+    processed = 0
+
+    try:
+        if only_unprocessed:
+            scraped_tweets = fetcher.iter_unprocessed("tweet", created_from, batch_size=fetch_batch_size)
+        else:
+            scraped_tweets = fetcher.iter_scraped("tweet", created_from, created_to, batch_size=fetch_batch_size)
+
+        scraped_batches = batched(scraped_tweets, batch_size)
+        while True:
+            with Instrumentation.stage("pipeline.fetch") as stage:
+                scraped_batch = next(scraped_batches, [])
+                stage.items = len(scraped_batch)
+            if not scraped_batch:
+                break
+
+            # ids are taken before processing, which drops `_id` from the prepared tweets
+            scraped_ids = [tweet['_id'] for tweet in scraped_batch]
+            with Instrumentation.stage("pipeline.clean", items=len(scraped_batch)):
+                tweets = list(iter_processed_tweets(scraped_batch, batch_size=len(scraped_batch)))
+                tweet_processor.mark_near_duplicates(tweets)
+
+            if tweets:
+                with Instrumentation.stage("pipeline.classify", items=len(tweets)):
+                    classifications = classify_tweets(tweets)
+
+                for classification in classifications:
+                    label = classification['label']
+                    counters[label] = counters.get(label, 0) + 1
+                processed += len(tweets)
+
+            writer.put((tweets, scraped_ids))
+    finally:
+        # a stopped writer does not need the end marker, its failure is raised below
+        if writer.is_alive():
+            try:
+                writer.put(None)
+            except Exception:
+                pass
+        writer.join()
+
+    if writer.failure is not None:
+        raise writer.failure
+
+    return {
+        "processed": processed,
+        "written": writer.written,
+        "counters": counters,
+        "errors": writer.errors
+    }
@@ -0,0 +1,26 @@
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+
+def batched(iterable: Iterable[T], batch_size: int) -> Iterator[List[T]]:
+    """
+    Lazily split an iterable into lists of at most `batch_size` items.
+
+    Args:
+    - iterable (Iterable): Items to split, consumed only as batches are requested.
+    - batch_size (int): Maximum number of items in a batch.
+
+    Returns:
+    - Iterator[List]: Consecutive batches, the last one may be shorter.
+    """
+    if batch_size < 1:
+        raise ValueError("Value for argument 'batch_size' must be at least 1.")
+
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
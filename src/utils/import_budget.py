@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+
+# entry point module -> import time budget in milliseconds
+IMPORT_BUDGETS_MS = {
+    "mongodb.mongo_connector": 500,
+    "mongodb.query_plan_check": 500,
+    "data_scraping.twitter_api": 1500,
+    "data_processing.process_scraped_data": 1000,
+    "classification.sentiment_analysis": 1000,
+}
+# heavy dependencies none of the entry points may import before the first model is loaded
+FORBIDDEN_MODULES = ("torch", "transformers", "onnxruntime")
+
+
+def measure_import(module: str) -> Dict[str, object]:
+    """
+    Imports the module in a fresh interpreter with `python -X importtime`.
+
+    Returns:
+        Dict[str, object]: Cumulative import time of the module in milliseconds and names of all imported modules.
+    """
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=src_dir,
+        capture_output=True,
+        text=True
+    )
+    if process.returncode != 0:
+        raise ImportError(f"Importing `{module}` failed:\n{process.stderr}")
+
+    # lines look like `import time:   self [us] | cumulative | imported package`
+    imported = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imported[name.strip()] = int(cumulative)
+
+    return {"milliseconds": imported.get(module, 0) / 1000, "modules": list(imported)}
+
+
+def check_import_budgets() -> List[dict]:
+    """ Measures every entry point and returns its import time, budget and forbidden heavy imports. """
+    results = []
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        measurement = measure_import(module)
+        forbidden = [name for name in FORBIDDEN_MODULES if name in measurement['modules']]
+        results.append({
+            "module": module,
+            "milliseconds": measurement['milliseconds'],
+            "budget": budget,
+            "forbidden_imports": forbidden,
+            "ok": measurement['milliseconds'] <= budget and not forbidden
+        })
+    return results
+
+
+if __name__ == "__main__":
+    # usage (from src/): python -m utils.import_budget
+    failed = False
+    for result in check_import_budgets():
+        status = "ok" if result['ok'] else "OVER BUDGET"
+        forbidden = f", imports {', '.join(result['forbidden_imports'])}" if result['forbidden_imports'] else ""
+        print(f"[{status}] {result['module']}: {result['milliseconds']:.0f} ms (budget {result['budget']} ms){forbidden}")
+        failed = failed or not result['ok']
+    sys.exit(1 if failed else 0)
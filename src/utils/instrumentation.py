@@ -0,0 +1,259 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple, Union
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss_bytes() -> int:
+    """ Returns the peak resident set size of this process so far, 0 where it cannot be measured. """
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> int:
+    """ Returns the current resident set size of this process, 0 where it cannot be measured. """
+    try:
+        with open("/proc/self/statm") as file:
+            resident_pages = int(file.read().split()[1])
+    except (OSError, ValueError, IndexError):  # /proc is Linux only
+        return 0
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclass
+class StageStats:
+    """Class representing the totals of all runs of a single pipeline stage."""
+    runs: int = 0
+    items: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    last_items_per_second: float = 0.0
+    max_rss_growth_bytes: int = 0
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.seconds if self.seconds > 0 else 0.0
+
+
+class StageRecord:
+    """Mutable record of a single stage run, the number of processed items can be set inside the stage."""
+    def __init__(self, items: int = 0):
+        self.items = items
+
+
+class Instrumentation(object):
+    """
+    Process-wide timing, throughput and memory metrics of the pipeline stages.
+
+    Every stage run records its duration, the number of processed items and the resident set size
+    of the process before and after the run (RSS is process-wide, so stages running concurrently in
+    other threads contribute to it). Runs are summed up per stage, buffered and appended as JSON lines
+    to `PIPELINE_METRICS_JSONL` when set, and served in the Prometheus text format by `start_http_server`.
+    Stages and events recorded in worker processes are sent back with the task results and merged with `merge`.
+    """
+    JSONL_PATH = os.environ.get("PIPELINE_METRICS_JSONL")
+    # number of buffered JSONL events written to the file at once, the rest is written at exit
+    JSONL_FLUSH_EVENTS = int(os.environ.get("PIPELINE_METRICS_FLUSH_EVENTS", 100))
+
+    STAGES: Dict[str, StageStats] = {}
+    _LOCK = threading.Lock()
+    _EVENTS: List[dict] = []
+    # serializes flushes, so buffered events reach the file in the recorded order
+    _FLUSH_LOCK = threading.Lock()
+    # set in worker processes, whose events are kept for `drain` instead of being written to the file
+    _FORWARDING = False
+    _SERVER = None
+
+
+    @staticmethod
+    @contextmanager
+    def stage(name: str, items: int = 0) -> Iterator[StageRecord]:
+        """ Times the enclosed block as a run of the stage `name`, e.g. `with Instrumentation.stage("fetch") as stage: stage.items = n`. """
+        record = StageRecord(items)
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            Instrumentation.record(name, time.perf_counter() - start, record.items, rss_before, current_rss_bytes())
+
+    @staticmethod
+    def record(name: str, seconds: float, items: int = 0, rss_before: Union[int, None] = None, rss_after: Union[int, None] = None):
+        """ Records a run of the stage `name` which processed `items` items in `seconds`, RSS before and after the run is optional. """
+        items_per_second = items / seconds if seconds > 0 else 0.0
+        rss_growth = rss_after - rss_before if rss_before is not None and rss_after is not None else 0
+        flush = False
+        with Instrumentation._LOCK:
+            stats = Instrumentation.STAGES.setdefault(name, StageStats())
+            stats.runs += 1
+            stats.items += items
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.last_items_per_second = items_per_second
+            stats.max_rss_growth_bytes = max(stats.max_rss_growth_bytes, rss_growth)
+
+            if Instrumentation.JSONL_PATH:
+                Instrumentation._EVENTS.append({
+                    "time": time.time(),
+                    "pid": os.getpid(),
+                    "stage": name,
+                    "seconds": round(seconds, 6),
+                    "items": items,
+                    "items_per_second": round(items_per_second, 2),
+                    "rss_before_bytes": rss_before,
+                    "rss_after_bytes": rss_after
+                })
+                flush = not Instrumentation._FORWARDING and len(Instrumentation._EVENTS) >= Instrumentation.JSONL_FLUSH_EVENTS
+
+        if flush:
+            Instrumentation.flush()
+
+    @staticmethod
+    def flush():
+        """ Appends the buffered JSONL events to `PIPELINE_METRICS_JSONL`, without blocking stages recording meanwhile. """
+        if Instrumentation._FORWARDING:
+            return
+        with Instrumentation._FLUSH_LOCK:
+            with Instrumentation._LOCK:
+                events, Instrumentation._EVENTS = Instrumentation._EVENTS, []
+            if not events or not Instrumentation.JSONL_PATH:
+                return
+            with open(Instrumentation.JSONL_PATH, "a") as file:
+                file.write("".join(json.dumps(event) + "\n" for event in events))
+
+    @staticmethod
+    def forward_to_parent(jsonl_path: Union[str, None]):
+        """ Makes a worker process keep the JSONL events of its stages for `drain` when the parent writes them to `jsonl_path`. """
+        Instrumentation.JSONL_PATH = jsonl_path
+        Instrumentation._FORWARDING = True
+
+    @staticmethod
+    def drain() -> Tuple[Dict[str, StageStats], List[dict]]:
+        """ Returns and clears the stages and JSONL events recorded in this process, used by worker processes to report to the parent. """
+        with Instrumentation._LOCK:
+            stages, Instrumentation.STAGES = Instrumentation.STAGES, {}
+            events, Instrumentation._EVENTS = Instrumentation._EVENTS, []
+            return stages, events
+
+    @staticmethod
+    def merge(stages: Dict[str, StageStats], events: List[dict] = ()):
+        """ Adds stages and JSONL events drained in another process (e.g. an inference worker) to this process. """
+        flush = False
+        with Instrumentation._LOCK:
+            if Instrumentation.JSONL_PATH:
+                Instrumentation._EVENTS.extend(events)
+                flush = not Instrumentation._FORWARDING and len(Instrumentation._EVENTS) >= Instrumentation.JSONL_FLUSH_EVENTS
+            for name, other in stages.items():
+                stats = Instrumentation.STAGES.setdefault(name, StageStats())
+                stats.runs += other.runs
+                stats.items += other.items
+                stats.seconds += other.seconds
+                stats.max_seconds = max(stats.max_seconds, other.max_seconds)
+                stats.last_items_per_second = other.last_items_per_second
+                stats.max_rss_growth_bytes = max(stats.max_rss_growth_bytes, other.max_rss_growth_bytes)
+
+        if flush:
+            Instrumentation.flush()
+
+    @staticmethod
+    def snapshot() -> Dict[str, dict]:
+        """ Returns totals of every stage recorded in this process. """
+        with Instrumentation._LOCK:
+            return {
+                name: {
+                    "runs": stats.runs,
+                    "items": stats.items,
+                    "seconds": round(stats.seconds, 4),
+                    "max_seconds": round(stats.max_seconds, 4),
+                    "items_per_second": round(stats.items_per_second, 2),
+                    "max_rss_growth_bytes": stats.max_rss_growth_bytes
+                }
+                for name, stats in Instrumentation.STAGES.items()
+            }
+
+    @staticmethod
+    def prometheus_text() -> str:
+        """ Returns all stage metrics in the Prometheus text exposition format. """
+        metrics = [
+            ("pipeline_stage_runs_total", "counter", "Number of runs of the stage.", lambda stats: stats.runs),
+            ("pipeline_stage_items_total", "counter", "Number of items processed by the stage.", lambda stats: stats.items),
+            ("pipeline_stage_seconds_total", "counter", "Time spent in the stage.", lambda stats: stats.seconds),
+            ("pipeline_stage_max_seconds", "gauge", "Duration of the slowest run of the stage.", lambda stats: stats.max_seconds),
+            ("pipeline_stage_items_per_second", "gauge", "Throughput of the last run of the stage.", lambda stats: stats.last_items_per_second),
+            ("pipeline_stage_max_rss_growth_bytes", "gauge", "Largest growth of the resident set size during a run of the stage.", lambda stats: stats.max_rss_growth_bytes),
+        ]
+        with Instrumentation._LOCK:
+            stages = sorted(Instrumentation.STAGES.items())
+            lines = []
+            for metric, kind, description, value in metrics:
+                lines.append(f"# HELP {metric} {description}")
+                lines.append(f"# TYPE {metric} {kind}")
+                for name, stats in stages:
+                    lines.append(f'{metric}{{stage="{name}"}} {value(stats)}')
+
+        lines.append("# HELP process_rss_bytes Current resident set size of the process.")
+        lines.append("# TYPE process_rss_bytes gauge")
+        lines.append(f"process_rss_bytes {current_rss_bytes()}")
+        lines.append("# HELP process_peak_rss_bytes Peak resident set size of the process.")
+        lines.append("# TYPE process_peak_rss_bytes gauge")
+        lines.append(f"process_peak_rss_bytes {peak_rss_bytes()}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def start_http_server(port: int, host: str = "0.0.0.0"):
+        """ Serves `prometheus_text` on `http://host:port/metrics` from a background thread. """
+        if Instrumentation._SERVER is not None:
+            return Instrumentation._SERVER
+
+        # imported here, the HTTP stack is not needed by runs without the metrics endpoint
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = Instrumentation.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # scrapes every few seconds would flood the pipeline output
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+        Instrumentation._SERVER = server
+        return server
+
+    @staticmethod
+    def stop_http_server():
+        if Instrumentation._SERVER is not None:
+            Instrumentation._SERVER.shutdown()
+            Instrumentation._SERVER.server_close()
+            Instrumentation._SERVER = None
+
+    @staticmethod
+    def reset():
+        with Instrumentation._LOCK:
+            Instrumentation.STAGES.clear()
+            Instrumentation._EVENTS.clear()
+
+
+atexit.register(Instrumentation.flush)
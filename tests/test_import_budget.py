@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+import pytest
+from utils.import_budget import FORBIDDEN_MODULES, IMPORT_BUDGETS_MS, check_import_budgets
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+# every entry point talks to MongoDB, only the scraper needs twscrape on top
+DEPENDENCIES = {module: ("pymongo",) for module in IMPORT_BUDGETS_MS}
+DEPENDENCIES["data_scraping.twitter_api"] = ("pymongo", "twscrape")
+
+
+def test_entry_points_stay_within_import_budgets():
+    for dependency in sorted({dependency for dependencies in DEPENDENCIES.values() for dependency in dependencies}):
+        pytest.importorskip(dependency)
+    failed = [result for result in check_import_budgets() if not result['ok']]
+    assert failed == []
+
+
+@pytest.mark.parametrize("module", list(IMPORT_BUDGETS_MS))
+def test_entry_point_does_not_load_heavy_dependencies(module):
+    for dependency in DEPENDENCIES[module]:
+        pytest.importorskip(dependency)
+    # a fresh interpreter, modules imported by other tests must not hide the entry point's own imports
+    code = f"import sys, {module}; print(' '.join(name for name in {FORBIDDEN_MODULES!r} if name in sys.modules))"
+    process = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True, text=True)
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.split() == []
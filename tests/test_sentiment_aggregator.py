@@ -0,0 +1,119 @@
+from collections import defaultdict
+from datetime import datetime
+import pytest
+
+pytest.importorskip("pymongo")
+
+from classification.sentiment_aggregator import SentimentAggregator, contribution_deltas
+from mongodb.mongo_models import BulkUpsertResult, BulkWriteBatchError
+
+CREATED = datetime(2024, 5, 1, 13, 30)
+DAY = datetime(2024, 5, 1)
+
+
+class FakeConnector:
+    """In-memory stand-in of `MongoDatabase` failing the counter writes of the collections in `failing`."""
+    def __init__(self):
+        self.documents = defaultdict(dict)
+        self.failing = set()
+
+    @staticmethod
+    def _key(query: dict) -> tuple:
+        return tuple(sorted(query.items()))
+
+    def find(self, collection, query):
+        ids = query["_id"]["$in"]
+        return [dict(self.documents[collection][(("_id", id),)]) for id in ids if (("_id", id),) in self.documents[collection]]
+
+    def bulk_increment(self, collection, operations, batch_size=1000):
+        result = BulkUpsertResult(batches=1)
+        for index, (query, increments) in enumerate(operations):
+            if collection in self.failing:
+                result.failed_operations.append(index)
+                continue
+            document = self.documents[collection].setdefault(self._key(query), dict(query))
+            for counter, value in increments.items():
+                document[counter] = document.get(counter, 0) + value
+        if result.failed_operations:
+            result.errors.append(BulkWriteBatchError(0, "write failed"))
+        return result
+
+    def bulk_upsert(self, collection, operations, batch_size=1000):
+        for query, document in operations:
+            self.documents[collection][self._key(query)] = {**query, **document}
+        return BulkUpsertResult(batches=1)
+
+    def counters(self, collection, query):
+        return {key: value for key, value in self.documents[collection].get(self._key(query), {}).items() if key not in query}
+
+
+@pytest.fixture
+def aggregator():
+    aggregator = SentimentAggregator(source="tweets")
+    aggregator.connector = FakeConnector()
+    return aggregator
+
+
+def item(id, label, account="alice"):
+    return {"id": id, "label": label, "created": CREATED, "account": account, "tickers": ["BTC"]}
+
+
+def rollup_query(dimension="all", key="*", granularity="day", bucket=DAY):
+    return {"source": "tweets", "granularity": granularity, "dimension": dimension, "key": key, "bucket": bucket}
+
+
+def test_contribution_deltas_only_contain_changes():
+    a = {"collection": "daily", "query": {"day": DAY}, "counter": "positive_tweets"}
+    b = {"collection": "daily", "query": {"day": DAY}, "counter": "negative_tweets"}
+    assert contribution_deltas([a], [a]) == {}
+    assert contribution_deltas([], [a]) == {("daily", (("day", DAY),), "positive_tweets"): 1}
+    assert contribution_deltas([a], [b]) == {
+        ("daily", (("day", DAY),), "positive_tweets"): -1,
+        ("daily", (("day", DAY),), "negative_tweets"): 1,
+    }
+
+
+def test_reapplying_the_same_items_is_idempotent(aggregator):
+    connector = aggregator.connector
+    assert aggregator.apply([item(1, "Bullish"), item(2, "Bearish")]) == {DAY: {"positive_tweets": 1, "negative_tweets": 1}}
+    assert aggregator.apply([item(1, "Bullish"), item(2, "Bearish")]) == {}
+
+    assert connector.counters("daily_sentiment", {"day": DAY}) == {"positive_tweets": 1, "negative_tweets": 1}
+    assert connector.counters("sentiment_rollups", rollup_query("coin", "BTC")) == {"positive": 1, "negative": 1}
+
+
+def test_relabelled_item_moves_its_counts(aggregator):
+    connector = aggregator.connector
+    aggregator.apply([item(1, "Bullish")])
+    assert aggregator.apply([item(1, "Bearish")]) == {DAY: {"positive_tweets": -1, "negative_tweets": 1}}
+
+    assert connector.counters("daily_sentiment", {"day": DAY}) == {"positive_tweets": 0, "negative_tweets": 1}
+    assert connector.counters("sentiment_rollups", rollup_query("account", "alice", "hour", datetime(2024, 5, 1, 13))) == {"positive": 0, "negative": 1}
+
+
+def test_failed_rollup_write_is_completed_without_double_counting(aggregator):
+    connector = aggregator.connector
+    connector.failing = {"sentiment_rollups"}
+    with pytest.raises(RuntimeError):
+        aggregator.apply([item(1, "Bullish")])
+
+    assert connector.counters("daily_sentiment", {"day": DAY}) == {"positive_tweets": 1}
+    assert connector.counters("sentiment_rollups", rollup_query()) == {}
+
+    connector.failing = set()
+    assert aggregator.apply([item(1, "Bullish")]) == {}
+
+    assert connector.counters("daily_sentiment", {"day": DAY}) == {"positive_tweets": 1}
+    assert connector.counters("sentiment_rollups", rollup_query()) == {"positive": 1}
+    assert aggregator.apply([item(1, "Bullish")]) == {}
+    assert connector.counters("sentiment_rollups", rollup_query()) == {"positive": 1}
+
+
+def test_legacy_ledger_entries_count_as_fully_applied(aggregator):
+    connector = aggregator.connector
+    aggregator.apply([item(1, "Bullish")])
+    entry = connector.documents["sentiment_ledger"][(("_id", "tweets:1"),)]
+    del entry["contributions"]
+
+    assert aggregator.apply([item(1, "Bullish")]) == {}
+    assert connector.counters("daily_sentiment", {"day": DAY}) == {"positive_tweets": 1}
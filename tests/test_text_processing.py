@@ -0,0 +1,46 @@
+import random
+import pytest
+from data_processing.text_processing import TextProcessor
+
+
+@pytest.fixture(scope="module")
+def processor():
+    return TextProcessor()
+
+
+TEXTS = [
+    "",
+    "Plain text without any tags",
+    "Check https://example.com/a?b=c now",
+    "#BTC to the moon",
+    "Buying $ETH and $btc today",
+    "$#BTC looks cheap",
+    "$$#eth #$sol $",
+    "price$#BTC",
+    "#ビットコイン is up",
+    "$BTC #ビットコイン",
+    "$btc#über #Ünïcode $ÄBC",
+    "#BTChttps://example.com",
+    "$ETHhttps://t.co/x rest",
+    "#tag_https://t.co/x",
+    "line\n\nline",
+    "line\nhttps://t.co/a\nhttps://t.co/b\n\nline",
+    "https://t.co/a\n\n#tag\nhttps://t.co/b",
+    "\n\n\n",
+    "end with url https://t.co/a\n",
+    "http://a.b/#frag #real $REAL",
+    "Mixed CASE #HashTag $CashTag http://X.Y/Z\nNEXT",
+]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_fused_cleaning_matches_sequential_chain(processor, text):
+    assert processor.remove_urls_hashtags_endline_chars(text) == processor._clean_sequentially(text)
+
+
+def test_fused_cleaning_matches_sequential_chain_on_random_texts(processor):
+    fragments = ["#", "$", "$#", "#$", "http://", "https://t.co/", "\n", "\n\n", " ", "_", "a", "B", "7", "é", "ß", "ビ", "/", "."]
+    rng = random.Random(0)
+    for _ in range(5000):
+        text = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 12)))
+        assert processor.remove_urls_hashtags_endline_chars(text) == processor._clean_sequentially(text), repr(text)
@@ -0,0 +1,86 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("twscrape")
+
+import data_scraping.twitter_api as twitter_api
+from utils.date_utils import TIMEZONE
+
+USER_ID = 7
+NOW = datetime.datetime.now(TIMEZONE)
+OLD = NOW - datetime.timedelta(days=2)
+
+
+def make_tweet(tweet_id: int, date: datetime.datetime, user_id: int = USER_ID, pinned_ids=()):
+    user = SimpleNamespace(id=user_id, username=f"user{user_id}", pinnedIds=list(pinned_ids))
+    return SimpleNamespace(id=tweet_id, date=date, user=user, rawContent=f"tweet {tweet_id}")
+
+
+class FakeApi:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested_pages = 0
+
+    async def user_tweets_raw(self, user_id, limit=-1):
+        for page in self.pages:
+            self.requested_pages += 1
+            yield page
+
+
+class FakeScrapeState:
+    def __init__(self, last_tweet_id):
+        self.last_tweet_id = last_tweet_id
+
+    async def get_high_water_mark(self, user_id):
+        return {"last_tweet_id": self.last_tweet_id}
+
+
+class FakeConnector:
+    async def find(self, collection, query):
+        return []
+
+
+def make_scraper(pages, last_tweet_id):
+    scraper = twitter_api.TwitterScraper.__new__(twitter_api.TwitterScraper)
+    scraper.api = FakeApi(pages)
+    scraper.scrape_state = FakeScrapeState(last_tweet_id)
+    scraper.db_connector = FakeConnector()
+    scraper.collection_name = "scraped_data"
+    return scraper
+
+
+def test_out_of_order_page_is_read_whole(monkeypatch):
+    # pages are lists of tweets already, the parser only has to pass them through
+    monkeypatch.setattr(twitter_api, "parse_tweets", lambda page, limit: page)
+    pinned = make_tweet(10, OLD, pinned_ids=[10])
+    first_page = [
+        pinned,
+        # older originals behind a retweet and a quote come before the account's own newer tweets
+        make_tweet(20, OLD, user_id=99),
+        make_tweet(21, OLD, user_id=98),
+        make_tweet(120, NOW),
+        make_tweet(40, NOW),  # below the high-water mark, already scraped
+        make_tweet(121, NOW),
+    ]
+    old_page = [make_tweet(30, OLD), make_tweet(31, OLD)]
+    never_requested = [make_tweet(130, NOW)]
+    scraper = make_scraper([first_page, old_page, never_requested], last_tweet_id=50)
+
+    tweets = asyncio.run(scraper.get_todays_users_posts(USER_ID))
+
+    assert sorted(tweet['tweet_id'] for tweet in tweets) == [120, 121]
+    assert scraper.api.requested_pages == 2
+
+
+def test_page_of_only_pinned_and_foreign_tweets_does_not_stop_pagination(monkeypatch):
+    monkeypatch.setattr(twitter_api, "parse_tweets", lambda page, limit: page)
+    first_page = [make_tweet(10, OLD, pinned_ids=[10]), make_tweet(20, OLD, user_id=99)]
+    second_page = [make_tweet(120, NOW), make_tweet(30, OLD)]
+    scraper = make_scraper([first_page, second_page], last_tweet_id=None)
+
+    tweets = asyncio.run(scraper.get_todays_users_posts(USER_ID))
+
+    assert [tweet['tweet_id'] for tweet in tweets] == [120]